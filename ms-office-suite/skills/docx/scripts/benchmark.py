@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+XMLEditor の処理系（minidom / lxml）を大きな document.xml で比較する。
+
+処理系ごとに別プロセスで XMLEditor を構築し、パース時間、ピークRSS、
+get_node による検索と編集、保存の時間を計測する。文書を指定しない場合は
+段落数を指定して合成した document.xml を使う。
+
+Usage:
+    python benchmark.py [--paragraphs 5000,20000] [--document PATH] [--json]
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_NAMES = ["minidom", "lxml"]
+LOOKUPS = 200
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W14_NS = "http://schemas.microsoft.com/office/word/2010/wordml"
+
+
+def write_document(path, paragraphs):
+    """段落数 paragraphs の合成 document.xml を書き出す。"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n')
+        f.write(f'<w:document xmlns:w="{W_NS}" xmlns:w14="{W14_NS}">\n<w:body>\n')
+        for i in range(paragraphs):
+            f.write(
+                f'<w:p w:rsidR="{i:08X}" w14:paraId="{i:08X}">'
+                '<w:pPr><w:pStyle w:val="Normal"/></w:pPr>'
+                f'<w:r><w:rPr><w:b/></w:rPr><w:t xml:space="preserve">Para {i} </w:t></w:r>'
+                "<w:r><w:t>The party of the first part agrees to the terms.</w:t></w:r>"
+                f"<w:r><w:t>Para {i} end</w:t></w:r></w:p>\n"
+            )
+        f.write("<w:sectPr/>\n</w:body>\n</w:document>\n")
+
+
+def peak_rss_mb():
+    """このプロセスのピークRSS（MB）を返す。"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux はキロバイト、macOS はバイトで返す
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(backend, path):
+    """1つの処理系を計測し、結果をJSONで標準出力に書く（子プロセス側）。"""
+    sys.path.insert(0, str(Path(__file__).parent))
+    from utilities import XMLEditor
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    editor = XMLEditor(path, backend=backend)
+    parse_time = time.perf_counter() - start
+    parse_rss = peak_rss_mb()
+
+    # w14:paraId は段落ごとに一意なので、get_node の検索キーに使う
+    para_ids = [
+        editor.get_attribute(p, "w14:paraId") for p in editor.find_all(editor.dom, "w:p")
+    ]
+    para_ids = [para_id for para_id in para_ids if para_id]
+    sample = para_ids[:: max(1, len(para_ids) // LOOKUPS)][:LOOKUPS]
+    start = time.perf_counter()
+    for para_id in sample:
+        editor.get_node("w:p", attrs={"w14:paraId": para_id})
+    lookup_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i, para_id in enumerate(sample):
+        node = editor.get_node("w:p", attrs={"w14:paraId": para_id})
+        editor.insert_after(node, f'<w:p><w:r><w:t>Edit {i}</w:t></w:r></w:p>')
+    edit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    editor.save()
+    save_time = time.perf_counter() - start
+
+    json.dump(
+        {
+            "backend": backend,
+            "lookups": len(sample),
+            "parse_s": round(parse_time, 3),
+            "lookup_s": round(lookup_time, 3),
+            "edit_s": round(edit_time, 3),
+            "save_s": round(save_time, 3),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "parse_rss_mb": round(parse_rss - baseline, 1),
+        },
+        sys.stdout,
+    )
+
+
+def measure(backend, source):
+    """source のコピーに対して処理系 backend を別プロセスで計測する。"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "document.xml"
+        path.write_bytes(Path(source).read_bytes())
+        result = subprocess.run(
+            [sys.executable, __file__, "--worker", backend, str(path)],
+            capture_output=True,
+            text=True,
+        )
+    if result.returncode != 0:
+        return {"backend": backend, "error": result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout)
+
+
+def print_markdown(reports):
+    """計測結果をMarkdownの表として出力する。"""
+    print("| Document | Size (MB) | Backend | Parse (s) | Lookups (s) | Edits (s) | Save (s) | Peak RSS (MB) | Parse RSS (MB) |")
+    print("|----------|-----------|---------|-----------|-------------|-----------|----------|---------------|----------------|")
+    for report in reports:
+        for row in report["backends"]:
+            if "error" in row:
+                print(f"| {report['document']} | {report['size_mb']} | {row['backend']} | {row['error']} | | | | | |")
+                continue
+            print(
+                f"| {report['document']} | {report['size_mb']} | {row['backend']} "
+                f"| {row['parse_s']} | {row['lookup_s']} | {row['edit_s']} | {row['save_s']} "
+                f"| {row['peak_rss_mb']} | {row['parse_rss_mb']} |"
+            )
+    print(f"\nLookups: up to {LOOKUPS} get_node calls by w14:paraId. Edits: one get_node and insert_after per lookup.")
+
+
+def main():
+    """メイン関数。"""
+    parser = argparse.ArgumentParser(description="XMLEditor の処理系を比較")
+    parser.add_argument("--paragraphs", default="5000,20000", help="合成文書の段落数（カンマ区切り）")
+    parser.add_argument("--document", help="合成文書の代わりに計測する document.xml")
+    parser.add_argument("--backends", default=",".join(BACKEND_NAMES), help="計測する処理系（カンマ区切り）")
+    parser.add_argument("--json", action="store_true", help="JSONで出力")
+    parser.add_argument("--worker", nargs=2, metavar=("BACKEND", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
+    backends = [name.strip() for name in args.backends.split(",") if name.strip()]
+    reports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.document:
+            sources = [(args.document, Path(args.document))]
+        else:
+            sources = []
+            for count in args.paragraphs.split(","):
+                path = Path(tmp) / f"document-{count}.xml"
+                write_document(path, int(count))
+                sources.append((f"{int(count)} paragraphs", path))
+        for label, path in sources:
+            reports.append(
+                {
+                    "document": str(label),
+                    "size_mb": round(path.stat().st_size / (1024 * 1024), 1),
+                    "backends": [measure(backend, path) for backend in backends],
+                }
+            )
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        print_markdown(reports)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,36 +6,157 @@ Word文書の変更履歴とコメント管理ライブラリ。
 コメントの追加・編集を行う。
 """
 
-from datetime import datetime
+import re
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
-import defusedxml.minidom
-
+from redline import PatternSet, TextIndex, TextMatch
 from utilities import XMLEditor
 
+# w:t 以外でテキストとして数えるランの子要素
+RUN_CHARACTERS = {"w:tab": "\t", "w:br": "\n", "w:cr": "\n"}
+
 
 class DocxXMLEditor(XMLEditor):
     """Word固有の属性を自動注入するXMLEditor拡張。"""
 
-    def __init__(self, xml_path, author: str, rsid: str):
+    def __init__(self, xml_path, author: str, rsid: str, backend: str = "minidom"):
         """初期化。
 
         Args:
             xml_path: XMLファイルのパス
             author: 変更の著者名
             rsid: リビジョンセッションID
+            backend: XML処理系（"minidom" または "lxml"）
         """
-        super().__init__(xml_path)
+        super().__init__(xml_path, backend=backend)
         self.author = author
         self.rsid = rsid
-        self._change_id = 0
+        self._change_id = None  # 初回の採番時に既存の最大の w:id から始める
+
+    def _last_change_id(self) -> int:
+        """最後に使った変更IDを返す（初回は文書内の既存の w:id の最大値）。
+
+        w:ins / w:del の w:id は文書内で一意である必要があるため、変更履歴を
+        すでに含む文書では既存のIDの後ろから採番する。
+        """
+        if self._change_id is None:
+            values = self._attr_values(self._backend.attribute_key("w:id"))
+            self._change_id = max(
+                (int(value) for value, elems in values.items() if elems and value.isdigit()),
+                default=0,
+            )
+        return self._change_id
 
     def get_next_change_id(self) -> int:
         """次の変更IDを取得する。"""
-        self._change_id += 1
+        self._change_id = self._last_change_id() + 1
         return self._change_id
 
+    def reserve_change_ids(self, count: int) -> range:
+        """変更IDを count 個まとめて確保する。
+
+        Args:
+            count: 確保するIDの数
+
+        Returns:
+            確保した連続する変更ID
+        """
+        start = self._last_change_id() + 1
+        self._change_id = start + count - 1
+        return range(start, start + count)
+
+    def change_attributes(self, change_id: int, date: Optional[str] = None) -> dict[str, str]:
+        """w:ins / w:del 要素の属性（ID、著者、日時）を返す。
+
+        Args:
+            change_id: 変更ID
+            date: 変更日時（省略時は現在時刻）
+
+        Returns:
+            属性の辞書
+        """
+        return {"w:id": str(change_id), "w:author": self.author, "w:date": date or _change_date()}
+
+    def run_text(self, run) -> str:
+        """ランのテキストを返す（w:tab は "\t"、w:br と w:cr は "\n" として数える）。"""
+        return "".join(self._run_child_text(child) for child in self.children(run))
+
+    def _run_child_text(self, child) -> str:
+        if self.is_tag(child, "w:t"):
+            return self.get_text(child)
+        for tag, text in RUN_CHARACTERS.items():
+            if self.is_tag(child, tag):
+                return text
+        return ""
+
+    def split_run(self, run, offset: int):
+        """ランを run_text の offset 文字目で2つに分け、後半を直後の新しいランにする。
+
+        後半のランには元のランの属性と書式（w:rPr）を複製する。
+
+        Args:
+            run: w:r 要素
+            offset: 分割位置（0 < offset < len(run_text(run))）
+
+        Returns:
+            後半のラン
+
+        Raises:
+            ValueError: 分割位置がランの範囲外の場合
+        """
+        length = len(self.run_text(run))
+        if not 0 < offset < length:
+            raise ValueError(f"Split offset {offset} is outside the run (length {length})")
+
+        right = self.clone(run, deep=False)
+        moving = []
+        position = 0
+        for child in self.children(run):
+            if self.is_tag(child, "w:rPr"):
+                moving.append(self.clone(child))
+                continue
+            text = self._run_child_text(child)
+            if position >= offset:
+                moving.append(child)
+            elif position + len(text) > offset:
+                # 分割位置を含む w:t を2つに分ける
+                cut = offset - position
+                moving.append(self.create_element("w:t", {"xml:space": "preserve"}, text[cut:]))
+                self.set_text(child, text[:cut])
+                self.set_attribute(child, "xml:space", "preserve")
+            position += len(text)
+
+        self._backend.append(right, moving)
+        self._invalidate_text(run)
+        self.insert_after(run, right)
+        return right
+
+    def create_run(self, text: str, like=None):
+        """テキストのランを作成する（"\t" は w:tab、"\n" は w:br になる）。
+
+        Args:
+            text: ランのテキスト
+            like: 書式（w:rPr）を複製する元のラン
+
+        Returns:
+            作成したラン（文書には挿入されていない）
+        """
+        children = []
+        if like is not None:
+            children.extend(
+                self.clone(child) for child in self.children(like) if self.is_tag(child, "w:rPr")
+            )
+        for part in re.split(r"(\t|\n)", text):
+            if part == "\t":
+                children.append(self.create_element("w:tab"))
+            elif part == "\n":
+                children.append(self.create_element("w:br"))
+            elif part:
+                children.append(self.create_element("w:t", {"xml:space": "preserve"}, part))
+        return self.create_element("w:r", None, *children)
+
     def create_insertion(self, content: str) -> str:
         """挿入マークアップを作成する。
 
@@ -46,7 +167,7 @@ class DocxXMLEditor(XMLEditor):
             挿入タグで囲まれたコンテンツ
         """
         change_id = self.get_next_change_id()
-        date = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+        date = _change_date()
         return f'<w:ins w:id="{change_id}" w:author="{self.author}" w:date="{date}">{content}</w:ins>'
 
     def create_deletion(self, content: str) -> str:
@@ -59,10 +180,15 @@ class DocxXMLEditor(XMLEditor):
             削除タグで囲まれたコンテンツ
         """
         change_id = self.get_next_change_id()
-        date = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+        date = _change_date()
         return f'<w:del w:id="{change_id}" w:author="{self.author}" w:date="{date}">{content}</w:del>'
 
 
+def _change_date() -> str:
+    """変更履歴に記録する現在日時（UTC）を返す。"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
 class Document:
     """Word文書の変更履歴とコメントを管理するクラス。"""
 
@@ -72,6 +198,7 @@ class Document:
         author: str = "Claude",
         author_initials: str = "C",
         rsid: Optional[str] = None,
+        backend: str = "minidom",
     ):
         """初期化。
 
@@ -80,6 +207,7 @@ class Document:
             author: 変更の著者名
             author_initials: 著者のイニシャル
             rsid: リビジョンセッションID（省略時は自動生成）
+            backend: XML処理系（"minidom" または "lxml"。大きな文書では "lxml" が速い）
         """
         self.unpacked_dir = Path(unpacked_dir)
         self.author = author
@@ -88,7 +216,7 @@ class Document:
 
         # document.xmlエディタを初期化
         document_path = self.unpacked_dir / "word" / "document.xml"
-        self.editor = DocxXMLEditor(document_path, author, self.rsid)
+        self.editor = DocxXMLEditor(document_path, author, self.rsid, backend=backend)
 
         self._comment_id = 0
 
@@ -102,23 +230,88 @@ class Document:
         self._comment_id += 1
         return self._comment_id
 
+    def apply_changes(self, changes) -> list:
+        """変更履歴の操作をまとめて適用する。
+
+        ノードはその場で書き換える（シリアライズと再パースをしない）。日時は
+        バッチ全体で1つ、変更IDはまとめて確保するため、文書全体の変更も
+        操作数に比例した時間で済む。
+
+        Args:
+            changes: 操作のタプルのリスト。(操作名, ノード) の操作名は
+                "suggest_deletion"・"revert_insertion"・"revert_deletion"。
+                ("suggest_insertion", 基準ノード, コンテンツ) は、コンテンツ
+                （XML文字列、またはノードかそのリスト）を挿入として基準ノードの
+                後ろに追加する。基準ノードが同じバッチで削除されている場合は
+                その w:del の後ろに追加する（置換）。文字列のコンテンツは
+                1回のパースでまとめて変換する。
+
+        Returns:
+            作成した w:del / w:ins 要素のリスト（changes と同じ順序）
+
+        Raises:
+            ValueError: 不明な操作名が含まれる場合
+
+        Example:
+            doc.apply_changes(
+                [("suggest_deletion", run) for run in runs]
+                + [("suggest_insertion", anchor, "<w:r><w:t>新しい文</w:t></w:r>")]
+            )
+        """
+        changes = list(changes)
+        for change in changes:
+            if change[0] not in self._OPERATIONS:
+                raise ValueError(
+                    f"Unknown change operation: {change[0]}. "
+                    f"Choose from {', '.join(self._OPERATIONS)}"
+                )
+
+        parsed = iter(
+            self.editor.parse_fragments(
+                [
+                    change[2]
+                    for change in changes
+                    if change[0] == "suggest_insertion" and isinstance(change[2], str)
+                ]
+            )
+        )
+        change_ids = self.editor.reserve_change_ids(len(changes))
+        date = _change_date()
+
+        results = []
+        deleted = {}  # このバッチで削除マークアップに囲んだノード -> w:del
+        for (operation, node, *args), change_id in zip(changes, change_ids):
+            attrs = self.editor.change_attributes(change_id, date)
+            if operation == "suggest_insertion":
+                content = next(parsed) if isinstance(args[0], str) else args[0]
+                # 削除したノードの後ろへの挿入は w:del の内側ではなく外側に置く
+                anchor = deleted.get(node, node)
+                results.append(self._insert_change(anchor, content, attrs))
+            else:
+                results.append(getattr(self, f"_{operation}")(node, attrs))
+                if operation == "suggest_deletion":
+                    deleted[node] = results[-1]
+        return results
+
+    _OPERATIONS = ("suggest_deletion", "suggest_insertion", "revert_insertion", "revert_deletion")
+
     def suggest_deletion(self, node) -> None:
         """ノードを削除としてマークする。
 
         Args:
             node: 削除対象のDOMノード
         """
-        # w:t を w:delText に変換
-        for t_elem in node.getElementsByTagName("w:t"):
-            new_elem = self.editor.dom.createElement("w:delText")
-            new_elem.setAttribute("xml:space", "preserve")
-            while t_elem.firstChild:
-                new_elem.appendChild(t_elem.firstChild)
-            t_elem.parentNode.replaceChild(new_elem, t_elem)
+        self.apply_changes([("suggest_deletion", node)])
 
-        # 削除マークアップで囲む
-        deletion_xml = self.editor.create_deletion(node.toxml())
-        self.editor.replace_node(node, deletion_xml)
+    def suggest_insertion(self, node, content) -> None:
+        """コンテンツを挿入としてノードの後ろに追加する。
+
+        Args:
+            node: 挿入位置の直前のDOMノード
+            content: 挿入するXMLコンテンツ（例: "<w:r><w:t>テキスト</w:t></w:r>"）
+                またはノード
+        """
+        self.apply_changes([("suggest_insertion", node, content)])
 
     def revert_insertion(self, node) -> None:
         """挿入を削除に変換する（変更を元に戻す）。
@@ -126,21 +319,7 @@ class Document:
         Args:
             node: w:ins 要素ノード
         """
-        # 挿入の内容を削除に変換
-        for t_elem in node.getElementsByTagName("w:t"):
-            new_elem = self.editor.dom.createElement("w:delText")
-            new_elem.setAttribute("xml:space", "preserve")
-            while t_elem.firstChild:
-                new_elem.appendChild(t_elem.firstChild)
-            t_elem.parentNode.replaceChild(new_elem, t_elem)
-
-        # w:insタグを取得して内容を削除マークアップに変換
-        inner_content = ""
-        for child in node.childNodes:
-            inner_content += child.toxml()
-
-        deletion_xml = self.editor.create_deletion(inner_content)
-        self.editor.replace_node(node, deletion_xml)
+        self.apply_changes([("revert_insertion", node)])
 
     def revert_deletion(self, node) -> None:
         """削除を挿入に変換する（削除を却下）。
@@ -148,21 +327,77 @@ class Document:
         Args:
             node: w:del 要素ノード
         """
-        # w:delText を w:t に変換
-        for del_text in node.getElementsByTagName("w:delText"):
-            new_elem = self.editor.dom.createElement("w:t")
-            new_elem.setAttribute("xml:space", "preserve")
-            while del_text.firstChild:
-                new_elem.appendChild(del_text.firstChild)
-            del_text.parentNode.replaceChild(new_elem, del_text)
-
-        # 内容を挿入マークアップで囲む
-        inner_content = ""
-        for child in node.childNodes:
-            inner_content += child.toxml()
-
-        insertion_xml = self.editor.create_insertion(inner_content)
-        self.editor.replace_node(node, insertion_xml)
+        self.apply_changes([("revert_deletion", node)])
+
+    def find_text(self, patterns, ignore_case: bool = False) -> list[TextMatch]:
+        """複数のランにまたがるテキストを、多数のパターンについて一度に検索する。
+
+        Args:
+            patterns: 検索する文字列または re.Pattern のリスト
+            ignore_case: 文字列パターンの大文字と小文字を区別しない
+
+        Returns:
+            文書順の一致（段落要素、連結テキスト内の開始・終了位置、テキスト、
+            一致したパターン）のリスト
+        """
+        return TextIndex(self.editor).find(PatternSet(patterns, ignore_case))
+
+    def redline(self, replacements: dict, ignore_case: bool = False) -> list[TextMatch]:
+        r"""一致したテキストを変更履歴付きで置換する（検索・分割・変更を一括で行う）。
+
+        すべてのパターンを1回の走査で検索し、一致範囲の境界でランを分割してから、
+        一致したランの削除と置換後のテキストの挿入を1つのバッチ（apply_changes）で
+        適用する。挿入するランは、一致範囲の先頭のランの書式を引き継ぐ。
+
+        Args:
+            replacements: 検索パターン（文字列または re.Pattern）から置換後の
+                テキストへの辞書。値には一致したテキストを受け取って置換後の
+                テキストを返す関数も指定できる。空文字列の場合は削除だけを行う
+            ignore_case: 文字列パターンの大文字と小文字を区別しない
+
+        Returns:
+            置換した一致のリスト
+
+        Example:
+            doc.redline({"甲": "委託者", "乙": "受託者", re.compile(r"\d+日以内"): "30日以内"})
+        """
+        index = TextIndex(self.editor)
+        matches = index.find(PatternSet(replacements, ignore_case))
+        changes = []
+        for match, runs in zip(matches, index.isolate(matches)):
+            changes.extend(("suggest_deletion", run) for run in runs)
+            replacement = replacements[match.pattern]
+            if callable(replacement):
+                replacement = replacement(match.text)
+            if replacement:
+                run = self.editor.create_run(replacement, like=runs[0])
+                changes.append(("suggest_insertion", runs[-1], run))
+        self.apply_changes(changes)
+        return matches
+
+    def _suggest_deletion(self, node, attrs):
+        # w:t を w:delText に変換し、ノードを削除マークアップで囲む
+        for t_elem in self.editor.find_all(node, "w:t"):
+            self.editor.retag(t_elem, "w:delText", {"xml:space": "preserve"})
+        return self.editor.wrap(node, "w:del", attrs)
+
+    def _insert_change(self, node, content, attrs):
+        nodes = content if isinstance(content, (list, tuple)) else [content]
+        insertion = self.editor.create_element("w:ins", attrs, *nodes)
+        self.editor.insert_after(node, insertion)
+        return insertion
+
+    def _revert_insertion(self, node, attrs):
+        # 挿入の内容を削除に変換し、w:ins を w:del に置き換える
+        for t_elem in self.editor.find_all(node, "w:t"):
+            self.editor.retag(t_elem, "w:delText", {"xml:space": "preserve"})
+        return self.editor.retag(node, "w:del", attrs)
+
+    def _revert_deletion(self, node, attrs):
+        # w:delText を w:t に変換し、w:del を w:ins に置き換える
+        for del_text in self.editor.find_all(node, "w:delText"):
+            self.editor.retag(del_text, "w:t", {"xml:space": "preserve"})
+        return self.editor.retag(node, "w:ins", attrs)
 
     def save(self) -> None:
         """変更をファイルに保存する。"""
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+複数のランにまたがるテキストの検索と、変更履歴付きの一括置換。
+
+TextIndex は段落ごとにランのテキストを連結し、各ランが連結テキストのどの範囲を
+占めるかの対応表を持つ。PatternSet は多数の文字列パターン（トライ構造の正規表現）と
+正規表現パターンを1つの正規表現にまとめ、段落ごとに1回の走査ですべての一致を
+見つける。一致範囲の境界でランを分割すれば、一致したテキストだけをランの単位で
+削除・挿入として変更履歴に残せる（Document.redline を参照）。
+"""
+
+import re
+from bisect import bisect_right
+from typing import NamedTuple, Union
+
+# 内側のランを検索・置換の対象にしない変更履歴の要素
+TRACKED_CHANGES = ("w:ins", "w:del", "w:moveFrom", "w:moveTo")
+
+# re.Pattern のフラグのうち、範囲指定のインラインフラグ (?i:...) にできるもの
+# （re.UNICODE は文字列パターンの既定なので何もしない。それ以外のフラグは ValueError）
+_INLINE_FLAGS = {
+    re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s", re.VERBOSE: "x", re.ASCII: "a",
+}
+
+
+class TextMatch(NamedTuple):
+    """段落の連結テキスト内の一致。"""
+
+    paragraph: object  # w:p 要素
+    start: int
+    end: int
+    text: str
+    pattern: Union[str, re.Pattern]  # 一致したパターン（PatternSet に渡したもの）
+
+
+class PatternSet:
+    """多数の検索パターンを1つの正規表現にまとめたもの。
+
+    文字列パターンはトライ構造の正規表現1つにまとめるため、パターン数が増えても
+    各位置で調べるのは共通の接頭辞をたどる分だけで済む。re.Pattern はそれぞれ
+    名前付きグループとして後ろに連ねる（番号による後方参照は使えない）。一致は
+    左から重ならないように選び、同じ位置からは最長の文字列パターン、次に
+    正規表現パターンを指定順に優先する。
+    """
+
+    def __init__(self, patterns, ignore_case: bool = False):
+        """パターンをコンパイルする。
+
+        Args:
+            patterns: 文字列または re.Pattern のリスト
+            ignore_case: 文字列パターンの大文字と小文字を区別しない
+
+        Raises:
+            ValueError: 空のパターンが含まれる、インラインフラグにできないフラグ
+                （re.LOCALE など）やバイト列の re.Pattern が含まれる、または
+                正規表現をまとめられない場合
+        """
+        self.ignore_case = ignore_case
+        self._literals = {}  # 正規化した文字列 -> 元のパターン
+        self._regexes = []
+        for pattern in patterns:
+            if isinstance(pattern, re.Pattern):
+                unsupported = pattern.flags & ~(re.UNICODE | sum(_INLINE_FLAGS))
+                if unsupported or not isinstance(pattern.pattern, str):
+                    raise ValueError(
+                        f"Unsupported search pattern {pattern!r}: only str patterns with "
+                        f"flags IGNORECASE, MULTILINE, DOTALL, VERBOSE or ASCII can be combined"
+                    )
+                self._regexes.append(pattern)
+            elif not pattern:
+                raise ValueError("Empty search pattern")
+            else:
+                self._literals.setdefault(self._normalize(pattern), pattern)
+
+        groups = []
+        if self._literals:
+            trie = _trie_pattern(self._literals)
+            groups.append(f"(?P<literal>(?i:{trie}))" if ignore_case else f"(?P<literal>{trie})")
+        for i, regex in enumerate(self._regexes):
+            flags = "".join(
+                letter for flag, letter in _INLINE_FLAGS.items() if regex.flags & flag
+            )
+            body = f"(?{flags}:{regex.pattern})" if flags else f"(?:{regex.pattern})"
+            groups.append(f"(?P<regex{i}>{body})")
+        try:
+            self._compiled = re.compile("|".join(groups)) if groups else None
+        except re.error as e:
+            raise ValueError(f"Cannot combine search patterns: {e}") from e
+
+    def _normalize(self, text):
+        return text.lower() if self.ignore_case else text
+
+    def finditer(self, text):
+        """text 内の重ならない一致を (開始, 終了, パターン) として順に返す。"""
+        if self._compiled is None:
+            return
+        for match in self._compiled.finditer(text):
+            start, end = match.span()
+            if start == end:
+                continue
+            if match.lastgroup == "literal":
+                found = match.group()
+                pattern = self._literals.get(self._normalize(found))
+                if pattern is None:
+                    # lower() と正規表現の大文字小文字の同一視が食い違う文字の場合
+                    pattern = next(
+                        p for p in self._literals.values()
+                        if re.fullmatch(re.escape(p), found, re.IGNORECASE)
+                    )
+            else:
+                pattern = self._regexes[int(match.lastgroup[len("regex"):])]
+            yield start, end, pattern
+
+
+def _trie_pattern(words):
+    """文字列の集合に最長一致する正規表現を、トライをたどる形で作る。"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        # 分岐のない区間は1つの文字列にまとめ、再帰を分岐点の数に抑える
+        prefix = []
+        while len(node) == 1 and "" not in node:
+            (char, node), = node.items()
+            prefix.append(re.escape(char))
+        branches = [re.escape(char) + build(child) for char, child in sorted(
+            (item for item in node.items() if item[0]), key=lambda item: item[0]
+        )]
+        if not branches:
+            rest = ""
+        elif len(branches) == 1:
+            rest = branches[0]
+        else:
+            rest = f"(?:{'|'.join(branches)})"
+        if "" in node and rest:
+            rest = f"(?:{rest})?"
+        return "".join(prefix) + rest
+
+    return build(trie)
+
+
+class _Paragraph:
+    """段落の連結テキストと、ランごとの開始位置の対応表。"""
+
+    __slots__ = ("element", "text", "starts", "runs", "breaks")
+
+    def __init__(self, element, text, starts, runs, breaks):
+        self.element = element
+        self.text = text
+        self.starts = starts  # runs[i] のテキストは text[starts[i]:starts[i + 1]]
+        self.runs = runs
+        self.breaks = breaks  # 変更履歴で途切れる位置（一致はこれをまたがない）
+
+    def segments(self):
+        """変更履歴で途切れない (開始, 終了) の範囲を順に返す。"""
+        bounds = [0, *self.breaks, len(self.text)]
+        return zip(bounds, bounds[1:])
+
+    def end(self, i):
+        return self.starts[i + 1] if i + 1 < len(self.starts) else len(self.text)
+
+
+class TextIndex:
+    """段落ごとに連結したテキストと、各文字が属するランの対応表。
+
+    段落内の w:r（w:hyperlink などの内側も含む）を文書順にたどり、
+    DocxXMLEditor.run_text のテキストを連結する。テキストを持たないランと、
+    テキストボックス内の入れ子の段落は含まない。既存の変更履歴（w:ins、w:del、
+    w:moveFrom、w:moveTo）の内側のランも含まず、その位置で連結テキストを区切る。
+    変更の内側に w:ins / w:del を入れ子にすることはできないため、一致はこれらの
+    ランにも区切りにもまたがらない。
+    """
+
+    def __init__(self, editor):
+        """文書全体のインデックスを構築する。
+
+        Args:
+            editor: DocxXMLEditor
+        """
+        self.editor = editor
+        self.paragraphs = []
+        self._by_element = {}
+        for element in editor.find_all(editor.dom, "w:p"):
+            nested = {
+                run for inner in editor.find_all(element, "w:p")
+                for run in editor.find_all(inner, "w:r")
+            }
+            tracked = {
+                run for tag in TRACKED_CHANGES for change in editor.find_all(element, tag)
+                for run in editor.find_all(change, "w:r")
+            }
+            parts, starts, runs, breaks = [], [], [], []
+            position = 0
+            for run in editor.find_all(element, "w:r"):
+                if run in nested:
+                    continue
+                if run in tracked:
+                    if position and (not breaks or breaks[-1] != position):
+                        breaks.append(position)
+                    continue
+                text = editor.run_text(run)
+                if text:
+                    parts.append(text)
+                    starts.append(position)
+                    runs.append(run)
+                    position += len(text)
+            text = "".join(parts)
+            if breaks and breaks[-1] == len(text):
+                breaks.pop()
+            paragraph = _Paragraph(element, text, starts, runs, breaks)
+            self.paragraphs.append(paragraph)
+            self._by_element[element] = paragraph
+
+    def find(self, patterns: PatternSet) -> list[TextMatch]:
+        """すべての段落からパターンの一致を探す（段落ごとに1回の走査）。
+
+        Args:
+            patterns: PatternSet
+
+        Returns:
+            文書順の一致のリスト
+        """
+        return [
+            TextMatch(paragraph.element, offset + start, offset + end,
+                      paragraph.text[offset + start : offset + end], pattern)
+            for paragraph in self.paragraphs
+            if paragraph.text
+            for offset, stop in paragraph.segments()
+            for start, end, pattern in patterns.finditer(paragraph.text[offset:stop])
+        ]
+
+    def isolate(self, matches: list[TextMatch]) -> list[list]:
+        """一致範囲の境界でランを分割し、一致ごとにその範囲のランを返す。
+
+        分割は段落ごとにまとめて行い、対応表も更新するため、同じ段落の
+        複数の一致や、後から find した一致にもそのまま使える。
+
+        Args:
+            matches: find が返した一致（重ならないこと）
+
+        Returns:
+            一致ごとの、範囲をちょうど覆うランのリスト
+        """
+        boundaries = {}
+        for match in matches:
+            offsets = boundaries.setdefault(match.paragraph, set())
+            offsets.update((match.start, match.end))
+        for element, offsets in boundaries.items():
+            self._split(self._by_element[element], offsets)
+
+        result = []
+        for match in matches:
+            paragraph = self._by_element[match.paragraph]
+            first = bisect_right(paragraph.starts, match.start) - 1
+            last = bisect_right(paragraph.starts, match.end - 1) - 1
+            result.append(paragraph.runs[first : last + 1])
+        return result
+
+    def _split(self, paragraph, offsets):
+        """段落のランを offsets の各位置で分割し、対応表を更新する。"""
+        starts, runs = [], []
+        offsets = sorted(offsets)
+        for i, run in enumerate(paragraph.runs):
+            start, end = paragraph.starts[i], paragraph.end(i)
+            cuts = [offset for offset in offsets if start < offset < end]
+            # 後ろから分割すると、元のランは常に先頭部分として残る
+            pieces = [self.editor.split_run(run, offset - start) for offset in reversed(cuts)]
+            starts.append(start)
+            runs.append(run)
+            for offset, piece in zip(cuts, reversed(pieces)):
+                starts.append(offset)
+                runs.append(piece)
+        paragraph.starts, paragraph.runs = starts, runs
@@ -4,25 +4,44 @@ OOXML文書編集用ユーティリティ。
 
 XMLEditorクラスは、行番号ベースのノード検索と
 DOM操作をサポートするXMLファイル編集ツールを提供する。
+
+XMLの処理系は構築時に backend で選ぶ。既定の "minidom" は defusedxml.minidom の
+DOMを、"lxml" は lxml（libxml2）のツリーを使う。lxml はパースが速くメモリ使用量も
+小さいため、大きな文書に向く。どちらの場合も XMLEditor のメソッドは同じように使えるが、
+get_node などが返すノードはそれぞれの処理系の要素オブジェクトになる。
 """
 
+import copy
 import html
+from collections import defaultdict
 from pathlib import Path
 from typing import Optional, Union
+from xml.sax.saxutils import escape
 
 import defusedxml.minidom
 import defusedxml.sax
 
+XML_NAMESPACE = "http://www.w3.org/XML/1998/namespace"
+
 
 class XMLEditor:
     """行番号ベースのノード検索をサポートするOOXML XMLファイルエディタ。"""
 
-    def __init__(self, xml_path):
+    def __init__(self, xml_path, backend: str = "minidom"):
         """XMLファイルを読み込んでエディタを初期化する。
 
         Args:
             xml_path: XMLファイルのパス
+            backend: XML処理系（"minidom" または "lxml"）
+
+        Raises:
+            ValueError: ファイルが存在しない、処理系が不明、または lxml が
+                インストールされていない場合
         """
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown backend: {backend}. Choose from {', '.join(BACKENDS)}"
+            )
         self.xml_path = Path(xml_path)
         if not self.xml_path.exists():
             raise ValueError(f"XML file not found: {xml_path}")
@@ -31,8 +50,105 @@ class XMLEditor:
             header = f.read(200).decode("utf-8", errors="ignore")
         self.encoding = "ascii" if 'encoding="ascii"' in header else "utf-8"
 
-        parser = _create_line_tracking_parser()
-        self.dom = defusedxml.minidom.parse(str(self.xml_path), parser)
+        self.backend = backend
+        self._backend = BACKENDS[backend]()
+        self.dom, elements = self._backend.parse(self.xml_path)
+        self._backend.load_namespaces(self.dom)
+        self._build_index(elements)
+
+    def reindex(self):
+        """ノード検索用のインデックスを構築し直す。
+
+        インデックスはパース時に一度だけ構築され、replace_node・insert_after・
+        insert_before・append_to による変更に追従する。これらを経由せずにDOMを
+        直接変更した（要素の追加、属性やテキストの書き換え）後に呼び出す。
+        ルート要素の名前空間宣言を変更した場合も、フラグメントのパースに使う
+        宣言を読み直すために呼び出す。
+        """
+        self._backend.load_namespaces(self.dom)
+        self._build_index(self._backend.all_elements(self.dom))
+
+    def _build_index(self, elements):
+        """文書順の要素リストからインデックスを構築する。"""
+        self._tag_index = defaultdict(dict)  # タグ名 -> {要素: None}
+        self._line_index = defaultdict(dict)  # 行番号 -> {要素: None}
+        self._attr_index = {}  # 属性名 -> {属性値: {要素: None}}（初めて検索された属性のみ）
+        self._text_cache = {}  # 要素 -> テキストコンテンツ
+        tag_index, line_index = self._tag_index, self._line_index
+        tag_of, line_of = self._backend.tag, self._backend.line
+        for elem in elements:
+            tag_index[tag_of(elem)][elem] = None
+            line = line_of(elem)
+            if line is not None:
+                line_index[line][elem] = None
+
+    def _index_subtree(self, root):
+        """要素とその子孫をインデックスに登録する。"""
+        backend = self._backend
+        for elem in backend.subtree(root):
+            self._tag_index[backend.tag(elem)][elem] = None
+            line = backend.line(elem)
+            if line is not None:
+                self._line_index[line][elem] = None
+            for attr_name, values in self._attr_index.items():
+                if backend.has_attribute(elem, attr_name):
+                    values.setdefault(backend.get_attribute(elem, attr_name), {})[elem] = None
+
+    def _unindex_subtree(self, root):
+        """要素とその子孫をインデックスから取り除く。"""
+        backend = self._backend
+        for elem in backend.subtree(root):
+            self._tag_index.get(backend.tag(elem), {}).pop(elem, None)
+            self._line_index.get(backend.line(elem), {}).pop(elem, None)
+            for attr_name, values in self._attr_index.items():
+                if backend.has_attribute(elem, attr_name):
+                    values.get(backend.get_attribute(elem, attr_name), {}).pop(elem, None)
+            self._text_cache.pop(elem, None)
+
+    def _invalidate_text(self, elem):
+        """要素と祖先のキャッシュ済みテキストを破棄する。"""
+        while elem is not None:
+            self._text_cache.pop(elem, None)
+            elem = self._backend.parent(elem)
+
+    def _attr_values(self, attr_name):
+        """属性値 -> 要素の索引を返す（初回に全要素を走査して構築する）。"""
+        values = self._attr_index.get(attr_name)
+        if values is None:
+            values = self._attr_index[attr_name] = {}
+            backend = self._backend
+            for elems in self._tag_index.values():
+                for elem in elems:
+                    if backend.has_attribute(elem, attr_name):
+                        values.setdefault(backend.get_attribute(elem, attr_name), {})[elem] = None
+        return values
+
+    def _is_attached(self, elem):
+        """要素が現在もこの文書のツリー内にあるか判定する。"""
+        top = self._backend.top(self.dom)
+        while elem is not None:
+            if elem is top:
+                return True
+            elem = self._backend.parent(elem)
+        return False
+
+    def _candidates(self, tag, attrs, line_number):
+        """インデックスから絞り込んだ検索候補（最も小さい集合）を返す。"""
+        if tag == "*":
+            pools = [[elem for elems in self._tag_index.values() for elem in elems]]
+        else:
+            pools = [self._tag_index.get(self._backend.tag_key(tag), {})]
+        if line_number is not None:
+            lines = line_number if isinstance(line_number, range) else [line_number]
+            if len(lines) > len(self._line_index):
+                lines = [line for line in self._line_index if line in lines]
+            pools.append([elem for line in lines for elem in self._line_index.get(line, ())])
+        for attr_name, attr_value in (attrs or {}).items():
+            # getAttribute は属性がない場合も "" を返すため、空値は索引で絞り込まない
+            if attr_value != "":
+                attr_key = self._backend.attribute_key(attr_name)
+                pools.append(self._attr_values(attr_key).get(attr_value, {}))
+        return list(min(pools, key=len))
 
     def get_node(
         self,
@@ -46,7 +162,7 @@ class XMLEditor:
         Args:
             tag: タグ名
             attrs: 属性のフィルター辞書
-            line_number: 行番号または行範囲
+            line_number: 行番号または行範囲（挿入・複製したノードは行番号を持たず、一致しない）
             contains: 含むべきテキスト
 
         Returns:
@@ -55,11 +171,25 @@ class XMLEditor:
         Raises:
             ValueError: ノードが見つからないか、複数見つかった場合
         """
+        backend = self._backend
         matches = []
-        for elem in self.dom.getElementsByTagName(tag):
+        normalized_contains = html.unescape(contains) if contains is not None else None
+        tag_key = backend.tag_key(tag)
+        attr_keys = (
+            {backend.attribute_key(name): value for name, value in attrs.items()}
+            if attrs is not None
+            else None
+        )
+        for elem in self._candidates(tag, attrs, line_number):
+            if tag != "*" and backend.tag(elem) != tag_key:
+                continue
+            if not self._is_attached(elem):
+                # DOMを直接変更して切り離された要素
+                self._unindex_subtree(elem)
+                continue
+
             if line_number is not None:
-                parse_pos = getattr(elem, "parse_position", (None,))
-                elem_line = parse_pos[0]
+                elem_line = backend.line(elem)
                 if isinstance(line_number, range):
                     if elem_line not in line_number:
                         continue
@@ -67,17 +197,15 @@ class XMLEditor:
                     if elem_line != line_number:
                         continue
 
-            if attrs is not None:
+            if attr_keys is not None:
                 if not all(
-                    elem.getAttribute(attr_name) == attr_value
-                    for attr_name, attr_value in attrs.items()
+                    backend.get_attribute(elem, attr_key) == attr_value
+                    for attr_key, attr_value in attr_keys.items()
                 ):
                     continue
 
             if contains is not None:
-                elem_text = self._get_element_text(elem)
-                normalized_contains = html.unescape(contains)
-                if normalized_contains not in elem_text:
+                if normalized_contains not in self._get_element_text(elem):
                     continue
 
             matches.append(elem)
@@ -107,57 +235,207 @@ class XMLEditor:
         return matches[0]
 
     def _get_element_text(self, elem):
-        """要素のテキストコンテンツを取得する。"""
+        """要素のテキストコンテンツを取得する（子孫の分も含めてキャッシュする）。"""
+        text = self._text_cache.get(elem)
+        if text is not None:
+            return text
         text_parts = []
-        for node in elem.childNodes:
-            if node.nodeType == node.TEXT_NODE:
-                if node.data.strip():
-                    text_parts.append(node.data)
-            elif node.nodeType == node.ELEMENT_NODE:
-                text_parts.append(self._get_element_text(node))
-        return "".join(text_parts)
+        for part in self._backend.content(elem):
+            if isinstance(part, str):
+                text_parts.append(part)
+            else:
+                text_parts.append(self._get_element_text(part))
+        text = self._text_cache[elem] = "".join(text_parts)
+        return text
 
-    def replace_node(self, elem, new_content):
-        """ノードを新しいコンテンツで置換する。"""
-        parent = elem.parentNode
-        nodes = self._parse_fragment(new_content)
+    def _added(self, parent, nodes):
+        """挿入したノードをインデックスに登録し、親のテキストキャッシュを破棄する。"""
         for node in nodes:
-            parent.insertBefore(node, elem)
-        parent.removeChild(elem)
+            self._index_subtree(node)
+        self._invalidate_text(parent)
+
+    def replace_node(self, elem, new_content):
+        """ノードを新しいコンテンツで置換する。
+
+        new_content にはXML文字列のほか、create_element や parse_fragments で
+        作成したノード（またはそのリスト）も渡せる。insert_after・insert_before・
+        append_to も同様。
+        """
+        parent = self._backend.parent(elem)
+        nodes = self._fragment_nodes(new_content)
+        self._backend.replace(elem, nodes)
+        self._unindex_subtree(elem)
+        self._added(parent, nodes)
         return nodes
 
     def insert_after(self, elem, xml_content):
         """要素の後にコンテンツを挿入する。"""
-        parent = elem.parentNode
-        next_sibling = elem.nextSibling
-        nodes = self._parse_fragment(xml_content)
-        for node in nodes:
-            if next_sibling:
-                parent.insertBefore(node, next_sibling)
-            else:
-                parent.appendChild(node)
+        parent = self._backend.parent(elem)
+        nodes = self._fragment_nodes(xml_content)
+        self._backend.insert_after(elem, nodes)
+        self._added(parent, nodes)
         return nodes
 
     def insert_before(self, elem, xml_content):
         """要素の前にコンテンツを挿入する。"""
-        parent = elem.parentNode
-        nodes = self._parse_fragment(xml_content)
-        for node in nodes:
-            parent.insertBefore(node, elem)
+        parent = self._backend.parent(elem)
+        nodes = self._fragment_nodes(xml_content)
+        self._backend.insert_before(elem, nodes)
+        self._added(parent, nodes)
         return nodes
 
     def append_to(self, elem, xml_content):
         """要素の子として末尾にコンテンツを追加する。"""
-        nodes = self._parse_fragment(xml_content)
-        for node in nodes:
-            elem.appendChild(node)
+        nodes = self._fragment_nodes(xml_content)
+        self._backend.append(elem, nodes)
+        self._added(elem, nodes)
         return nodes
 
+    def create_element(self, tag: str, attrs: Optional[dict[str, str]] = None, *children):
+        """XML文字列のパースを経ずに、文書に挿入できる要素を直接作成する。
+
+        Args:
+            tag: タグ名（例: "w:r"）
+            attrs: 属性の辞書
+            *children: 子ノード（create_element で作成した要素、または文字列のテキスト）
+
+        Returns:
+            作成した要素（replace_node などにそのまま渡せる）
+
+        Example:
+            run = editor.create_element(
+                "w:r", {"w:rsidR": rsid},
+                editor.create_element("w:t", {"xml:space": "preserve"}, "テキスト"),
+            )
+            editor.insert_after(node, run)
+        """
+        backend = self._backend
+        return backend.create_element(
+            self.dom,
+            backend.tag_key(tag),
+            {backend.attribute_key(name): value for name, value in (attrs or {}).items()},
+            children,
+        )
+
+    def parse_fragments(self, xml_contents: list[str]) -> list[list]:
+        """複数のXMLフラグメントを1回のパースでノードリストに変換する。
+
+        Args:
+            xml_contents: XMLフラグメントのリスト
+
+        Returns:
+            フラグメントごとのノードリスト（replace_node などにそのまま渡せる）
+        """
+        if not xml_contents:
+            return []
+        fragments = self._backend.parse_fragments(self.dom, xml_contents)
+        for nodes in fragments:
+            self._check_fragment(nodes)
+        return fragments
+
+    def find_all(self, elem, tag: str):
+        """要素の子孫のうち、タグ名が一致するものを文書順に返す。
+
+        Args:
+            elem: 検索の起点となる要素（要素自身は含まない）
+            tag: タグ名（例: "w:t"）
+
+        Returns:
+            一致した要素のリスト
+        """
+        return self._backend.find_all(elem, self._backend.tag_key(tag))
+
+    def retag(self, elem, tag: str, attrs: Optional[dict[str, str]] = None):
+        """要素を、子ノードを引き継いだ別のタグの要素に置き換える。
+
+        元の要素の属性は引き継がず、attrs で指定した属性だけを設定する。
+
+        Args:
+            elem: 置き換える要素
+            tag: 新しいタグ名（例: "w:delText"）
+            attrs: 新しい要素に設定する属性
+
+        Returns:
+            新しい要素
+        """
+        backend = self._backend
+        parent = backend.parent(elem)
+        self._unindex_subtree(elem)
+        new_elem = backend.retag(
+            self.dom,
+            elem,
+            backend.tag_key(tag),
+            {backend.attribute_key(name): value for name, value in (attrs or {}).items()},
+        )
+        self._added(parent, [new_elem])
+        return new_elem
+
+    def wrap(self, elem, tag: str, attrs: Optional[dict[str, str]] = None):
+        """要素をその位置で新しい要素で囲む（要素自体は複製せずに移動する）。
+
+        Args:
+            elem: 囲む要素
+            tag: 囲む要素のタグ名（例: "w:del"）
+            attrs: 囲む要素の属性
+
+        Returns:
+            囲む要素
+        """
+        wrapper = self.create_element(tag, attrs)
+        parent = self._backend.parent(elem)
+        self._backend.wrap(elem, wrapper)
+        self._added(parent, [wrapper])
+        return wrapper
+
+    def get_attribute(self, elem, name: str) -> str:
+        """要素の属性値を返す（属性がない場合は空文字列）。"""
+        return self._backend.get_attribute(elem, self._backend.attribute_key(name))
+
+    def set_attribute(self, elem, name: str, value: str):
+        """要素の属性値を設定する（属性値のインデックスも更新する）。"""
+        backend = self._backend
+        key = backend.attribute_key(name)
+        values = self._attr_index.get(key)
+        if values is not None:
+            if backend.has_attribute(elem, key):
+                values.get(backend.get_attribute(elem, key), {}).pop(elem, None)
+            values.setdefault(value, {})[elem] = None
+        backend.set_attribute(elem, key, value)
+
+    def children(self, elem) -> list:
+        """要素の子要素を文書順に返す（テキストノードは含まない）。"""
+        return self._backend.children(elem)
+
+    def is_tag(self, elem, tag: str) -> bool:
+        """要素のタグ名が tag（例: "w:t"）か判定する。"""
+        return self._backend.tag(elem) == self._backend.tag_key(tag)
+
+    def get_text(self, elem) -> str:
+        """要素の直下のテキストを返す（空白も含めてそのまま返す）。"""
+        return self._backend.text(elem)
+
+    def set_text(self, elem, text: str):
+        """要素の直下のテキストを置き換える（子要素を持たない w:t などに使う）。"""
+        self._backend.set_text(self.dom, elem, text)
+        self._invalidate_text(elem)
+
+    def clone(self, elem, deep: bool = True):
+        """要素の複製を作成する（文書には挿入されていない状態で返す）。"""
+        return self._backend.clone(elem, deep)
+
+    def to_xml(self, node) -> str:
+        """ノードをXML文字列に変換する（ルート要素で宣言済みの名前空間は省く）。"""
+        return self._backend.to_xml(node)
+
+    def inner_xml(self, elem) -> str:
+        """要素の子ノードをXML文字列に変換する。"""
+        return self._backend.inner_xml(elem)
+
     def get_next_rid(self):
         """次のリレーションシップIDを取得する。"""
         max_id = 0
-        for rel_elem in self.dom.getElementsByTagName("Relationship"):
-            rel_id = rel_elem.getAttribute("Id")
+        for rel_elem in self.find_all(self.dom, "Relationship"):
+            rel_id = self.get_attribute(rel_elem, "Id")
             if rel_id.startswith("rId"):
                 try:
                     max_id = max(max_id, int(rel_id[3:]))
@@ -167,33 +445,457 @@ class XMLEditor:
 
     def save(self):
         """変更をファイルに保存する。"""
-        content = self.dom.toxml(encoding=self.encoding)
+        content = self._backend.serialize(self.dom, self.encoding)
         self.xml_path.write_bytes(content)
 
     def _parse_fragment(self, xml_content):
         """XMLフラグメントをパースしてノードリストを返す。"""
-        root_elem = self.dom.documentElement
+        return self._check_fragment(self._backend.parse_fragments(self.dom, [xml_content])[0])
+
+    def _fragment_nodes(self, content):
+        """XML文字列・ノード・ノードリストのいずれかを挿入用のノードリストにする。"""
+        if isinstance(content, str):
+            return self._parse_fragment(content)
+        if isinstance(content, (list, tuple)):
+            return self._check_fragment(list(content))
+        return self._check_fragment([content])
+
+    def _check_fragment(self, nodes):
+        assert any(
+            self._backend.is_element(node) for node in nodes
+        ), "Fragment must contain at least one element"
+        return nodes
+
+
+class _MinidomBackend:
+    """defusedxml.minidom によるXML処理系（既定）。"""
+
+    def parse(self, xml_path):
+        """ファイルをパースし、(DOM, 文書順の要素リスト) を返す。"""
+        elements = []
+        parser = _create_line_tracking_parser(elements.append)
+        dom = defusedxml.minidom.parse(str(xml_path), parser)
+        return dom, elements
+
+    def all_elements(self, dom):
+        return dom.getElementsByTagName("*")
+
+    def top(self, dom):
+        return dom
+
+    def tag_key(self, tag):
+        return tag
+
+    def attribute_key(self, name):
+        return name
+
+    def tag(self, elem):
+        return elem.tagName
+
+    def line(self, elem):
+        return getattr(elem, "parse_position", (None,))[0]
+
+    def is_element(self, node):
+        return node.nodeType == node.ELEMENT_NODE
+
+    def has_attribute(self, elem, key):
+        return elem.hasAttribute(key)
+
+    def get_attribute(self, elem, key):
+        return elem.getAttribute(key)
+
+    def parent(self, node):
+        return node.parentNode
+
+    def subtree(self, root):
+        """root とその子孫の要素を返す（順序は問わない）。"""
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.nodeType == node.ELEMENT_NODE:
+                yield node
+                stack.extend(node.childNodes)
+
+    def content(self, elem):
+        """空白だけではないテキストと子要素を文書順に返す。"""
+        for node in elem.childNodes:
+            if node.nodeType == node.TEXT_NODE:
+                if node.data.strip():
+                    yield node.data
+            elif node.nodeType == node.ELEMENT_NODE:
+                yield node
+
+    def find_all(self, elem, key):
+        return elem.getElementsByTagName(key)
+
+    def replace(self, elem, nodes):
+        parent = elem.parentNode
+        for node in nodes:
+            parent.insertBefore(node, elem)
+        parent.removeChild(elem)
+
+    def insert_after(self, elem, nodes):
+        parent = elem.parentNode
+        next_sibling = elem.nextSibling
+        for node in nodes:
+            if next_sibling:
+                parent.insertBefore(node, next_sibling)
+            else:
+                parent.appendChild(node)
+
+    def insert_before(self, elem, nodes):
+        parent = elem.parentNode
+        for node in nodes:
+            parent.insertBefore(node, elem)
+
+    def append(self, elem, nodes):
+        for node in nodes:
+            elem.appendChild(node)
+
+    def wrap(self, elem, wrapper):
+        elem.parentNode.insertBefore(wrapper, elem)
+        wrapper.appendChild(elem)
+
+    def children(self, elem):
+        return [node for node in elem.childNodes if node.nodeType == node.ELEMENT_NODE]
+
+    def _is_text(self, node):
+        return node.nodeType in (node.TEXT_NODE, node.CDATA_SECTION_NODE)
+
+    def text(self, elem):
+        return "".join(node.data for node in elem.childNodes if self._is_text(node))
+
+    def set_text(self, dom, elem, text):
+        for node in [node for node in elem.childNodes if self._is_text(node)]:
+            elem.removeChild(node)
+        if text:
+            elem.insertBefore(dom.createTextNode(text), elem.firstChild)
+
+    def set_attribute(self, elem, key, value):
+        elem.setAttribute(key, value)
+
+    def clone(self, elem, deep):
+        return elem.cloneNode(deep)
+
+    def retag(self, dom, elem, key, attrs):
+        new_elem = dom.createElement(key)
+        for name, value in attrs.items():
+            new_elem.setAttribute(name, value)
+        while elem.firstChild:
+            new_elem.appendChild(elem.firstChild)
+        elem.parentNode.replaceChild(new_elem, elem)
+        return new_elem
+
+    def to_xml(self, node):
+        return node.toxml()
+
+    def inner_xml(self, elem):
+        return "".join(child.toxml() for child in elem.childNodes)
+
+    def serialize(self, dom, encoding):
+        return dom.toxml(encoding=encoding)
+
+    def load_namespaces(self, dom):
+        """ルート要素の名前空間宣言から、フラグメント用のラッパー開始タグを作る。"""
+        root_elem = dom.documentElement
         namespaces = []
         if root_elem and root_elem.attributes:
             for i in range(root_elem.attributes.length):
                 attr = root_elem.attributes.item(i)
                 if attr.name.startswith("xmlns"):
                     namespaces.append(f'{attr.name}="{attr.value}"')
-
-        ns_decl = " ".join(namespaces)
-        wrapper = f"<root {ns_decl}>{xml_content}</root>"
+        self._prelude = f"<root {' '.join(namespaces)}>"
+
+    def create_element(self, dom, key, attrs, children):
+        elem = dom.createElement(key)
+        for name, value in attrs.items():
+            elem.setAttribute(name, value)
+        for child in children:
+            elem.appendChild(dom.createTextNode(child) if isinstance(child, str) else child)
+        return elem
+
+    def parse_fragments(self, dom, xml_contents):
+        """フラグメントを1つのラッパー文書にまとめてパースし、dom のノードにする。"""
+        wrapper = "".join(
+            [self._prelude, *(f"<fragment>{xml}</fragment>" for xml in xml_contents), "</root>"]
+        )
         fragment_doc = defusedxml.minidom.parseString(wrapper)
-        nodes = [
-            self.dom.importNode(child, deep=True)
-            for child in fragment_doc.documentElement.childNodes
+        return [
+            [dom.importNode(node, deep=True) for node in fragment.childNodes]
+            for fragment in fragment_doc.documentElement.childNodes
         ]
-        elements = [n for n in nodes if n.nodeType == n.ELEMENT_NODE]
-        assert elements, "Fragment must contain at least one element"
-        return nodes
 
 
-def _create_line_tracking_parser():
-    """行番号追跡パーサーを作成する。"""
+class _LxmlBackend:
+    """lxml（libxml2）によるXML処理系。
+
+    要素は lxml.etree の要素で、行番号は sourceline から取る。タグ名や属性名
+    （"w:p"、"w:id"）はルート要素の名前空間宣言で Clark 表記（"{uri}p"）に変換して
+    照合する。要素の後ろのテキストは lxml では tail に入るため、挿入・置換では
+    tail を minidom と同じ位置に保つ。フラグメントの先頭テキストは文字列として
+    ノードリストに含まれる。
+    """
+
+    def __init__(self):
+        try:
+            from lxml import etree
+        except ImportError:
+            raise ValueError("The lxml backend requires lxml: pip install lxml")
+        self.etree = etree
+        # 外部エンティティ・DTD・ネットワークを無効にして安全にパースする。信頼できない
+        # 文書も扱うため、libxml2 の上限（テキストノードの大きさ・入れ子の深さ）は外さない
+        self.parser = etree.XMLParser(resolve_entities=False, no_network=True, load_dtd=False)
+
+    def parse(self, xml_path):
+        """ファイルをパースし、(ツリー, 文書順の要素リスト) を返す。"""
+        tree = self.etree.parse(str(xml_path), self.parser)
+        return tree, list(tree.getroot().iter(self.etree.Element))
+
+    def load_namespaces(self, dom):
+        """ルート要素の名前空間宣言を読み込み、名前の変換とフラグメント用に保持する。"""
+        root = self._root = dom.getroot()
+        self._nsmap = dict(root.nsmap)
+        self._ns_decls = [
+            f' xmlns:{prefix}="{uri}"' if prefix else f' xmlns="{uri}"'
+            for prefix, uri in root.nsmap.items()
+        ]
+        self._prelude = f"<root{''.join(self._ns_decls)}>"
+        self._scratch = self.etree.Element("root", nsmap=self._nsmap)
+        self._keys = {}
+
+    def all_elements(self, dom):
+        return dom.getroot().iter(self.etree.Element)
+
+    def top(self, dom):
+        return dom.getroot()
+
+    def _key(self, name, default_namespace):
+        key = self._keys.get((name, default_namespace))
+        if key is None:
+            prefix, sep, local = name.rpartition(":")
+            if not sep:
+                uri = self._nsmap.get(None) if default_namespace else None
+            elif prefix == "xml":
+                uri = XML_NAMESPACE
+            else:
+                uri = self._nsmap.get(prefix) or self._find_namespace(prefix)
+                if uri is None:
+                    # 未宣言の接頭辞: どの要素にも一致しない名前のまま返す
+                    local = name
+            key = self._keys[(name, default_namespace)] = (
+                f"{{{uri}}}{local}" if uri else local
+            )
+        return key
+
+    def _find_namespace(self, prefix):
+        """ルート以外の要素で宣言された接頭辞の名前空間URIを探す。"""
+        for elem in self._root.iter(self.etree.Element):
+            uri = elem.nsmap.get(prefix)
+            if uri is not None:
+                return uri
+        return None
+
+    def tag_key(self, tag):
+        return tag if tag == "*" else self._key(tag, True)
+
+    def attribute_key(self, name):
+        return self._key(name, False)
+
+    def tag(self, elem):
+        return elem.tag
+
+    def line(self, elem):
+        # 行番号 0 は libxml2 で「不明」を表し、lxml は None として返す（_forget_lines）
+        return elem.sourceline or None
+
+    def is_element(self, node):
+        return not isinstance(node, str) and isinstance(node.tag, str)
+
+    def has_attribute(self, elem, key):
+        return elem.get(key) is not None
+
+    def get_attribute(self, elem, key):
+        return elem.get(key, "")
+
+    def parent(self, node):
+        return node.getparent()
+
+    def subtree(self, root):
+        if self.is_element(root):
+            return root.iter(self.etree.Element)
+        return ()
+
+    def content(self, elem):
+        """空白だけではないテキストと子要素を文書順に返す。"""
+        if elem.text and elem.text.strip():
+            yield elem.text
+        for child in elem:
+            if isinstance(child.tag, str):
+                yield child
+            if child.tail and child.tail.strip():
+                yield child.tail
+
+    def find_all(self, elem, key):
+        if hasattr(elem, "getroot"):  # 文書全体（ElementTree）
+            return list(elem.getroot().iter(key))
+        return [node for node in elem.iter(key) if node is not elem]
+
+    def _add_text(self, parent, previous, text):
+        """parent の子 previous の直後（None なら先頭）にテキストを追加する。"""
+        if previous is None:
+            parent.text = (parent.text or "") + text
+        else:
+            previous.tail = (previous.tail or "") + text
+
+    def replace(self, elem, nodes):
+        parent = elem.getparent()
+        self.insert_before(elem, nodes)
+        tail, elem.tail = elem.tail, None
+        if tail:
+            self._add_text(parent, elem.getprevious(), tail)
+        parent.remove(elem)
+
+    def insert_after(self, elem, nodes):
+        # minidom と同様に、元の tail は挿入したノードの後ろに残す
+        tail, elem.tail = elem.tail, None
+        anchor = elem
+        for node in nodes:
+            if isinstance(node, str):
+                anchor.tail = (anchor.tail or "") + node
+            else:
+                anchor.addnext(node)
+                anchor = node
+        if tail:
+            anchor.tail = (anchor.tail or "") + tail
+
+    def insert_before(self, elem, nodes):
+        parent = elem.getparent()
+        for node in nodes:
+            if isinstance(node, str):
+                self._add_text(parent, elem.getprevious(), node)
+            else:
+                elem.addprevious(node)
+
+    def append(self, elem, nodes):
+        for node in nodes:
+            if isinstance(node, str):
+                last = next(elem.iterchildren(reversed=True), None)
+                self._add_text(elem, last, node)
+            else:
+                elem.append(node)
+
+    def wrap(self, elem, wrapper):
+        elem.addprevious(wrapper)
+        # 元の tail は囲む要素の後ろに残す
+        wrapper.tail, elem.tail = elem.tail, None
+        wrapper.append(elem)
+
+    def children(self, elem):
+        return [child for child in elem if isinstance(child.tag, str)]
+
+    def text(self, elem):
+        return (elem.text or "") + "".join(child.tail or "" for child in elem)
+
+    def set_text(self, dom, elem, text):
+        for child in elem:
+            child.tail = None
+        elem.text = text or None
+
+    def set_attribute(self, elem, key, value):
+        elem.set(key, value)
+
+    def clone(self, elem, deep):
+        if deep:
+            copied = copy.deepcopy(elem)
+            copied.tail = None
+            self._forget_lines(copied)
+            return copied
+        copied = self.etree.SubElement(self._scratch, elem.tag, elem.attrib)
+        self._scratch.remove(copied)
+        return copied
+
+    def retag(self, dom, elem, key, attrs):
+        elem.attrib.clear()
+        elem.tag = key
+        for name, value in attrs.items():
+            elem.set(name, value)
+        return elem
+
+    def _strip_namespaces(self, xml):
+        """先頭タグからルート要素で宣言済みの名前空間宣言を取り除く。"""
+        end = xml.find(">")
+        head = xml[:end]
+        for decl in self._ns_decls:
+            head = head.replace(decl, "")
+        return head + xml[end:]
+
+    def to_xml(self, node, with_tail=False):
+        xml = self.etree.tostring(node, encoding="unicode", with_tail=with_tail)
+        return self._strip_namespaces(xml)
+
+    def inner_xml(self, elem):
+        parts = [escape(elem.text)] if elem.text else []
+        parts.extend(self.to_xml(child, with_tail=True) for child in elem)
+        return "".join(parts)
+
+    def serialize(self, dom, encoding):
+        standalone = dom.docinfo.standalone
+        declaration = f'<?xml version="1.0" encoding="{encoding}"'
+        if standalone is not None:
+            declaration += f' standalone="{"yes" if standalone else "no"}"'
+        body = self.etree.tostring(dom, encoding=encoding, xml_declaration=False)
+        return (declaration + "?>").encode(encoding) + body
+
+    def create_element(self, dom, key, attrs, children):
+        # ルートと同じ名前空間宣言を持つ作業用の親の下で作り、接頭辞を文書に揃える
+        elem = self.etree.SubElement(self._scratch, key, attrs)
+        self._scratch.remove(elem)
+        last = None
+        for child in children:
+            if isinstance(child, str):
+                self._add_text(elem, last, child)
+            else:
+                elem.append(child)
+                last = child
+        return elem
+
+    def parse_fragments(self, dom, xml_contents):
+        """フラグメントを1つのラッパー文書にまとめてパースする。"""
+        wrapper = "".join(
+            [self._prelude, *(f"<fragment>{xml}</fragment>" for xml in xml_contents), "</root>"]
+        )
+        root = self.etree.fromstring(wrapper.encode("utf-8"), self.parser)
+        fragments = []
+        for fragment in root:
+            nodes = [fragment.text] if fragment.text else []
+            for child in fragment:
+                self._forget_lines(child)
+                nodes.append(child)
+            fragments.append(nodes)
+        return fragments
+
+    @staticmethod
+    def _forget_lines(root):
+        """複製・パースしたノードの行番号を「不明」にする。
+
+        deepcopy は元の要素の行番号を、フラグメントはラッパー文書の行番号を持つため、
+        そのままでは get_node(line_number=...) が元ファイルの別の行として一致する。
+        libxml2 の行番号 0 は「不明」を意味し、sourceline は None を返すので、
+        minidom で作ったノードと同じく行番号の索引と検索の対象にならない。
+        """
+        for elem in root.iter():
+            elem.sourceline = 0
+
+
+BACKENDS = {"minidom": _MinidomBackend, "lxml": _LxmlBackend}
+
+
+def _create_line_tracking_parser(on_element=None):
+    """行番号追跡パーサーを作成する。
+
+    Args:
+        on_element: 要素が生成されるたびに文書順で呼ばれるコールバック（省略可）
+    """
 
     def set_content_handler(dom_handler):
         def startElementNS(name, tagName, attrs):
@@ -203,6 +905,8 @@ def _create_line_tracking_parser():
                 parser._parser.CurrentLineNumber,
                 parser._parser.CurrentColumnNumber,
             )
+            if on_element is not None:
+                on_element(cur_elem)
 
         orig_start_cb = dom_handler.startElementNS
         dom_handler.startElementNS = startElementNS
@@ -0,0 +1,87 @@
+"""Document.redline（既存の変更履歴を含む文書）と PatternSet のテスト。"""
+
+import os
+import re
+import sys
+from collections import Counter
+
+import pytest
+from defusedxml import ElementTree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from document import Document
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# w:id 6 と 7 の変更履歴をすでに含む段落
+DOCUMENT_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+<w:body>
+<w:p>
+<w:r><w:t xml:space="preserve">The Supplier </w:t></w:r>
+<w:ins w:id="6" w:author="Reviewer" w:date="2024-01-01T00:00:00Z"><w:r><w:t xml:space="preserve">Supplier </w:t></w:r></w:ins>
+<w:r><w:t xml:space="preserve">shall </w:t></w:r>
+<w:del w:id="7" w:author="Reviewer" w:date="2024-01-01T00:00:00Z"><w:r><w:delText xml:space="preserve">not </w:delText></w:r></w:del>
+<w:r><w:t>deliver to the Supplier.</w:t></w:r>
+</w:p>
+</w:body>
+</w:document>
+"""
+
+
+@pytest.fixture(params=["minidom", "lxml"])
+def document(request, tmp_path):
+    if request.param == "lxml":
+        pytest.importorskip("lxml")
+    (tmp_path / "word").mkdir()
+    (tmp_path / "word" / "document.xml").write_text(DOCUMENT_XML, encoding="utf-8")
+    return Document(str(tmp_path), backend=request.param)
+
+
+def _saved_root(document):
+    document.editor.save()
+    return ElementTree.parse(document.editor.xml_path).getroot()
+
+
+def test_redline_skips_runs_inside_tracked_changes(document):
+    matches = document.redline({"Supplier": "Vendor"})
+
+    assert [match.start for match in matches] == [4, 34]
+    root = _saved_root(document)
+    for change in root.iter(W + "ins"):
+        assert change.find(f".//{W}ins") is None
+        assert change.find(f".//{W}del") is None
+    for change in root.iter(W + "del"):
+        assert change.find(f".//{W}ins") is None
+        assert change.find(f".//{W}del") is None
+
+
+def test_matches_do_not_span_tracked_changes(document):
+    assert document.find_text(["Supplier shall", "Supplier  shall", "shall deliver"]) == []
+    assert [match.text for match in document.find_text(["deliver"])] == ["deliver"]
+
+
+def test_change_ids_continue_after_existing_ids(document):
+    document.redline({"Supplier": "Vendor"})
+
+    root = _saved_root(document)
+    ids = [
+        int(change.get(W + "id"))
+        for tag in ("ins", "del")
+        for change in root.iter(W + tag)
+    ]
+    assert len(ids) == 6
+    assert not [change_id for change_id, count in Counter(ids).items() if count > 1]
+    assert min(change_id for change_id in ids if change_id not in (6, 7)) == 8
+
+
+def test_pattern_flags_are_kept_or_rejected():
+    from redline import PatternSet
+
+    text = "café Supplier"
+    assert [m[:2] for m in PatternSet([re.compile(r"\w+", re.ASCII)]).finditer(text)] == [(0, 3), (5, 13)]
+    assert [m[:2] for m in PatternSet([re.compile(r"\w+")]).finditer(text)] == [(0, 4), (5, 13)]
+    assert [m[:2] for m in PatternSet([re.compile("supplier", re.I)]).finditer(text)] == [(5, 13)]
+    with pytest.raises(ValueError):
+        PatternSet([re.compile(rb"\w+", re.LOCALE)])
@@ -0,0 +1,114 @@
+"""XMLEditor の検索インデックスが編集操作に追従することのテスト。"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from utilities import XMLEditor
+
+DOCUMENT_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+<w:body>
+<w:p w:rsidR="00A1">
+<w:r><w:t xml:space="preserve">The Supplier </w:t></w:r>
+<w:ins w:id="6" w:author="Reviewer"><w:r><w:t xml:space="preserve">Supplier </w:t></w:r></w:ins>
+<w:r><w:t xml:space="preserve">shall </w:t></w:r>
+<w:del w:id="7" w:author="Reviewer"><w:r><w:delText xml:space="preserve">not </w:delText></w:r></w:del>
+<w:r><w:t>deliver.</w:t></w:r>
+</w:p>
+</w:body>
+</w:document>
+"""
+
+# (タグ, 属性, 含むべきテキスト)
+QUERIES = [
+    ("w:ins", {"w:id": "6"}, None),
+    ("w:ins", {"w:id": "16"}, None),
+    ("w:del", {"w:id": "7"}, None),
+    ("w:del", {"w:id": "9"}, None),
+    ("w:ins", {"w:author": "Editor"}, None),
+    ("w:r", None, "not "),
+    ("w:r", None, "appended"),
+    ("w:r", None, "first"),
+    ("w:r", None, "shall"),
+    ("w:r", None, "must"),
+    ("w:t", None, "deliver"),
+    ("w:delText", None, "deliver"),
+    ("w:p", None, "Vendor"),
+    ("w:p", {"w:rsidR": "00A1"}, "must"),
+    ("w:t", None, "Supplier"),
+]
+
+
+@pytest.fixture(params=["minidom", "lxml"])
+def editor(request, tmp_path):
+    if request.param == "lxml":
+        pytest.importorskip("lxml")
+    path = tmp_path / "document.xml"
+    path.write_text(DOCUMENT_XML, encoding="utf-8")
+    return XMLEditor(str(path), backend=request.param)
+
+
+def _lookup(editor):
+    """QUERIES の各検索結果を XML 文字列（見つからない・複数ある場合はエラー文）で返す。"""
+    found = {}
+    for tag, attrs, contains in QUERIES:
+        try:
+            found[tag, str(attrs), contains] = editor.to_xml(editor.get_node(tag, attrs, contains=contains))
+        except ValueError as e:
+            found[tag, str(attrs), contains] = str(e).split(".")[0]
+    return found
+
+
+def _indexed(editor):
+    """タグ索引に登録されている要素の集合（切り離された要素が残っていないかの確認用）。"""
+    return {tag: set(elems) for tag, elems in editor._tag_index.items() if elems}
+
+
+def _edit(editor):
+    """公開 API だけを使って文書を編集する。"""
+    _lookup(editor)  # 属性値の索引とテキストのキャッシュを編集前に作っておく
+    paragraph = editor.get_node("w:p")
+    inserted = editor.get_node("w:ins", {"w:id": "6"})
+    deleted = editor.get_node("w:del", {"w:id": "7"})
+    shall = editor.get_node("w:r", contains="shall")
+    deliver = editor.get_node("w:r", contains="deliver")
+
+    editor.set_attribute(inserted, "w:id", "16")
+    editor.replace_node(deleted, '<w:r><w:t xml:space="preserve">must </w:t></w:r>')
+    editor.insert_after(shall, '<w:ins w:id="8" w:author="Editor"><w:r><w:t>Vendor </w:t></w:r></w:ins>')
+    (first,) = editor.parse_fragments(['<w:r><w:t xml:space="preserve">first </w:t></w:r>'])
+    editor.insert_before(editor.get_node("w:r", contains="The Supplier"), first)
+    editor.append_to(paragraph, editor.create_element("w:r", None, editor.create_element("w:t", None, "appended")))
+    editor.retag(editor.find_all(deliver, "w:t")[0], "w:delText")
+    editor.wrap(deliver, "w:del", {"w:id": "9", "w:author": "Editor"})
+    editor.set_text(editor.get_node("w:t", contains="shall"), "will ")
+
+
+def test_index_matches_a_rebuilt_index_after_edits(editor):
+    _edit(editor)
+    indexed = _indexed(editor)  # get_node は切り離された要素を見つけると索引から外すので、検索より先に取る
+    after_edits = _lookup(editor)
+    editor.reindex()
+
+    assert indexed == _indexed(editor)
+    assert after_edits == _lookup(editor)
+    assert after_edits["w:ins", str({"w:id": "6"}), None].startswith("Node not found")
+    assert after_edits["w:del", str({"w:id": "7"}), None].startswith("Node not found")
+    assert after_edits["w:r", "None", "not "].startswith("Node not found")
+    assert after_edits["w:r", "None", "shall"].startswith("Node not found")
+    assert 'w:id="16"' in after_edits["w:ins", str({"w:id": "16"}), None]
+    assert "deliver." in after_edits["w:del", str({"w:id": "9"}), None]
+    assert "appended" in after_edits["w:r", "None", "appended"]
+
+
+def test_index_matches_a_fresh_parse_after_save(editor):
+    _edit(editor)
+    after_edits = _lookup(editor)
+    editor.save()
+
+    assert after_edits == _lookup(XMLEditor(str(editor.xml_path), backend=editor.backend))
+    assert len(editor.find_all(editor.dom, "w:r")) == 8
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+UI/UX Pro Max Benchmark - speed and ranking-quality measurements for the search engine
+Usage: python benchmark.py [backends] [--sizes 100,1000,10000,100000] [--large] [--queries 200] [--json]
+       python benchmark.py engine relevance [--repeat 5] [--json] [--baseline previous.json]
+
+Suites:
+  backends   BM25 fit/query/batch time per scoring backend on synthetic corpora, and the
+             smallest corpus size at which the numpy backend beats pure Python
+  engine     index build, cold query, warm query, cached query and batch throughput
+             for every domain and stack CSV
+  relevance  nDCG@k and MRR of the golden query set (golden_queries.json)
+
+--json emits one object keyed by suite, so runs can be saved and compared across commits;
+--baseline prints the change against such a file and exits 1 if nDCG or MRR dropped.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from itertools import accumulate
+from math import log2
+from pathlib import Path
+
+import core
+from core import BM25, MAX_RESULTS, _import_numpy
+
+WORDS_PER_DOC = (5, 40)
+LARGE_SIZE = 1_000_000  # backends corpus added by --large
+GOLDEN_FILE = Path(__file__).parent / "golden_queries.json"
+
+# Column naming a row in golden_queries.json (default: the domain's first output column)
+KEY_COLUMNS = {"ux": "Issue"}
+STACK_KEY_COLUMN = "Guideline"
+
+
+def synthetic_corpus(size, vocab_size, seed=0):
+    """Zipf-distributed documents, similar in shape to the guideline CSV rows"""
+    rng = random.Random(seed)
+    vocab = [f"term{i:06d}" for i in range(vocab_size)]
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(vocab_size)))
+    docs = []
+    for _ in range(size):
+        length = rng.randint(*WORDS_PER_DOC)
+        docs.append(" ".join(rng.choices(vocab, cum_weights=cum_weights, k=length)))
+    queries = [" ".join(rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(1, 4))) for _ in range(200)]
+    return docs, queries
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def bench_backend(backend, docs, queries, top_k):
+    """Time fit, sequential queries and one score_many() batch for a backend"""
+    bm25 = BM25(backend=backend)
+    _, fit_s = _timed(lambda: bm25.fit(docs))
+    # Pin fuzzy expansion off: its per-term LRU would be cold for the first pass and warm for the
+    # batch pass, so both would measure something other than scoring
+    fuzzy, core.FUZZY_MATCHING = core.FUZZY_MATCHING, False
+    try:
+        bm25.score(queries[0], top_k)  # warm caches
+        _, query_s = _timed(lambda: [bm25.score(q, top_k) for q in queries])
+        _, batch_s = _timed(lambda: bm25.score_many(queries, top_k))
+    finally:
+        core.FUZZY_MATCHING = fuzzy
+    return {
+        "backend": bm25.backend,
+        "fit_ms": round(fit_s * 1e3, 3),
+        "query_ms": round(query_s * 1e3 / len(queries), 4),
+        "batch_query_ms": round(batch_s * 1e3 / len(queries), 4),
+    }
+
+
+def run_backends(sizes, n_queries, vocab_size, top_k):
+    backends = ["python"] + (["numpy"] if _import_numpy()[0] is not None else [])
+    report = {"backends": backends, "results": [], "crossover": {}}
+    for size in sizes:
+        docs, queries = synthetic_corpus(size, vocab_size)
+        queries = (queries * (n_queries // len(queries) + 1))[:n_queries]
+        for backend in backends:
+            row = {"size": size, **bench_backend(backend, docs, queries, top_k)}
+            report["results"].append(row)
+
+    for key in ("query_ms", "batch_query_ms"):
+        report["crossover"][key] = None
+        for size in sizes:
+            times = {r["backend"]: r[key] for r in report["results"] if r["size"] == size}
+            if "numpy" in times and times["numpy"] < times["python"]:
+                report["crossover"][key] = size
+                break
+    return report
+
+
+def format_backends(report):
+    lines = ["## BM25 Backend Benchmark",
+             "| Rows | Backend | Fit (ms) | Query (ms) | Batched query (ms) |",
+             "|------|---------|----------|------------|--------------------|"]
+    for r in report["results"]:
+        lines.append(f"| {r['size']:,} | {r['backend']} | {r['fit_ms']} | {r['query_ms']} | {r['batch_query_ms']} |")
+    if "numpy" not in report["backends"]:
+        lines.append("\nNumPy is not installed; only the Python backend was measured.")
+    else:
+        for key, size in report["crossover"].items():
+            label = "single query" if key == "query_ms" else "batched query"
+            lines.append(f"\n**Crossover ({label}):** " + (f"numpy faster from {size:,} rows" if size else "numpy never faster"))
+    return "\n".join(lines)
+
+
+# ============ ENGINE ============
+def _targets():
+    """(label, filepath, search_cols, output_cols, request fields) for every domain and stack"""
+    for domain, config in core.CSV_CONFIG.items():
+        yield (domain, os.path.join(core.DATA_DIR, config["file"]), config["search_cols"], config["output_cols"],
+               {"domain": domain})
+    for stack, config in core.STACK_CONFIG.items():
+        yield (f"stack:{stack}", os.path.join(core.DATA_DIR, config["file"]), core._STACK_COLS["search_cols"],
+               core._STACK_COLS["output_cols"], {"stack": stack})
+
+
+def _key_column(request):
+    if "stack" in request:
+        return STACK_KEY_COLUMN
+    domain = request["domain"]
+    return KEY_COLUMNS.get(domain, core.CSV_CONFIG[domain]["output_cols"][0])
+
+
+def load_golden(path=GOLDEN_FILE):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _engine_queries(index, request, golden, n_queries):
+    """Golden queries for the target, padded with the key column of its rows"""
+    queries = [g["query"] for g in golden if g.get("domain") == request.get("domain") and g.get("stack") == request.get("stack")]
+    key_col = _key_column(request)
+    for row in index.rows(range(min(len(index.columns), n_queries)), [key_col]):
+        if row[key_col]:
+            queries.append(row[key_col])
+    return queries[:n_queries]
+
+
+def bench_target(filepath, search_cols, output_cols, request, golden, n_queries, repeat, top_k):
+    """Time build, cold/warm/cached queries and search_many() throughput for one CSV"""
+    build_s = min(_timed(lambda: core.SearchIndex.build(filepath, search_cols))[1] for _ in range(repeat))
+
+    cold = []
+    for _ in range(repeat):
+        core._INDEXES.clear()
+        core.RESULT_CACHE = core.ResultCache(0)
+        cold.append(_timed(lambda: core._search_csv(filepath, search_cols, output_cols, "benchmark", top_k))[1])
+
+    index = core.load_index(filepath, search_cols)
+    queries = _engine_queries(index, request, golden, n_queries)
+    search = lambda: [core._search_csv(filepath, search_cols, output_cols, q, top_k) for q in queries]
+    warm_s = min(_timed(search)[1] for _ in range(repeat))
+    batch = [{**request, "query": q, "max_results": top_k} for q in queries]
+    batch_s = min(_timed(lambda: list(core.search_many(batch)))[1] for _ in range(repeat))
+
+    core.RESULT_CACHE = core.ResultCache(len(queries))
+    search()  # fill the cache
+    cached_s = min(_timed(search)[1] for _ in range(repeat))
+    return {
+        "rows": index.bm25.N,
+        "queries": len(queries),
+        "build_ms": round(build_s * 1e3, 3),
+        "cold_query_ms": round(min(cold) * 1e3, 3),
+        "warm_query_ms": round(warm_s * 1e3 / len(queries), 4),
+        "cached_query_ms": round(cached_s * 1e3 / len(queries), 4),
+        "batch_qps": round(len(queries) / batch_s, 1),
+    }
+
+
+def run_engine(n_queries, repeat, top_k, golden):
+    """Engine timings for every domain and stack, with the shared result cache disabled"""
+    saved_cache = core.RESULT_CACHE
+    report = {"repeat": repeat, "targets": {}}
+    try:
+        for label, filepath, search_cols, output_cols, request in _targets():
+            if os.path.exists(filepath):
+                report["targets"][label] = bench_target(filepath, search_cols, output_cols, request,
+                                                        golden, n_queries, repeat, top_k)
+    finally:
+        core.RESULT_CACHE = saved_cache
+    return report
+
+
+def format_engine(report):
+    lines = ["## Search Engine Benchmark",
+             f"Best of {report['repeat']} runs; query times are per query, result cache disabled except for the cached column.",
+             "| Target | Rows | Build (ms) | Cold query (ms) | Warm query (ms) | Cached query (ms) | Batch (queries/s) |",
+             "|--------|------|------------|-----------------|-----------------|-------------------|-------------------|"]
+    for label, r in report["targets"].items():
+        lines.append(f"| {label} | {r['rows']} | {r['build_ms']} | {r['cold_query_ms']} | {r['warm_query_ms']} "
+                     f"| {r['cached_query_ms']} | {r['batch_qps']:,} |")
+    return "\n".join(lines)
+
+
+# ============ RELEVANCE ============
+def ndcg(ranked, expected, k):
+    """Binary-relevance nDCG@k of ranked row keys against the expected set"""
+    dcg = sum(1 / log2(i + 2) for i, key in enumerate(ranked[:k]) if key in expected)
+    ideal = sum(1 / log2(i + 2) for i in range(min(len(expected), k)))
+    return dcg / ideal if ideal else 0.0
+
+
+def reciprocal_rank(ranked, expected):
+    for i, key in enumerate(ranked):
+        if key in expected:
+            return 1 / (i + 1)
+    return 0.0
+
+
+def run_relevance(golden, k):
+    """Score every golden query; report per-query, per-target and overall nDCG@k / MRR"""
+    queries = []
+    for entry in golden:
+        request = {key: entry[key] for key in ("domain", "stack") if key in entry}
+        result = core._run_request({**request, "query": entry["query"], "max_results": k})
+        key_col = _key_column(request)
+        ranked = [row.get(key_col) for row in result.get("results", [])]
+        expected = set(entry["expected"])
+        queries.append({
+            "target": f"stack:{request['stack']}" if "stack" in request else request["domain"],
+            "query": entry["query"],
+            "ndcg": round(ndcg(ranked, expected, k), 4),
+            "rr": round(reciprocal_rank(ranked, expected), 4),
+            "missing": [key for key in entry["expected"] if key not in ranked],
+        })
+
+    def summary(items):
+        return {"queries": len(items),
+                "ndcg": round(sum(q["ndcg"] for q in items) / len(items), 4),
+                "mrr": round(sum(q["rr"] for q in items) / len(items), 4)}
+
+    targets = {}
+    for q in queries:
+        targets.setdefault(q["target"], []).append(q)
+    # Routing: how often detect_domain() picks the golden domain for queries given without one
+    routed = [(entry, core.detect_domain(entry["query"])) for entry in golden if "domain" in entry]
+    return {"k": k, **summary(queries),
+            "routing": round(sum(entry["domain"] == domain for entry, domain in routed) / len(routed), 4) if routed else None,
+            "targets": {label: summary(items) for label, items in targets.items()},
+            "results": queries}
+
+
+def format_relevance(report):
+    lines = ["## Relevance (golden queries)",
+             f"**nDCG@{report['k']}:** {report['ndcg']} | **MRR:** {report['mrr']} | **Queries:** {report['queries']}"
+             f" | **Domain routing accuracy:** {report['routing']}",
+             "", "| Target | Queries | nDCG | MRR |", "|--------|---------|------|-----|"]
+    for label, r in report["targets"].items():
+        lines.append(f"| {label} | {r['queries']} | {r['ndcg']} | {r['mrr']} |")
+    misses = [q for q in report["results"] if q["missing"]]
+    if misses:
+        lines += ["", "| Target | Query | nDCG | Expected but not returned |", "|--------|-------|------|---------------------------|"]
+        for q in misses:
+            lines.append(f"| {q['target']} | {q['query']} | {q['ndcg']} | {', '.join(q['missing'])} |")
+    return "\n".join(lines)
+
+
+# ============ BASELINE ============
+def compare(report, baseline):
+    """(metric, old, new) for every engine timing and relevance score present in both runs"""
+    changes = []
+    old_engine = baseline.get("engine", {}).get("targets", {})
+    for label, new in report.get("engine", {}).get("targets", {}).items():
+        for metric in ("build_ms", "cold_query_ms", "warm_query_ms", "batch_qps"):
+            if metric in old_engine.get(label, {}):
+                changes.append((f"engine.{label}.{metric}", old_engine[label][metric], new[metric]))
+    if "relevance" in report and "relevance" in baseline:
+        for metric in ("ndcg", "mrr", "routing"):
+            if baseline["relevance"].get(metric) is not None:
+                changes.append((f"relevance.{metric}", baseline["relevance"][metric], report["relevance"][metric]))
+    return changes
+
+
+def format_comparison(changes):
+    lines = ["## Change vs Baseline", "| Metric | Baseline | Current | Change |", "|--------|----------|---------|--------|"]
+    for metric, old, new in changes:
+        change = f"{(new - old) / old:+.1%}" if old else "n/a"
+        lines.append(f"| {metric} | {old} | {new} | {change} |")
+    return "\n".join(lines)
+
+
+SUITES = ("backends", "engine", "relevance")
+FORMATTERS = {"backends": format_backends, "engine": format_engine, "relevance": format_relevance}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UI Pro Max Benchmark")
+    parser.add_argument("suites", nargs="*", metavar="SUITE", help=f"Suites to run: {', '.join(SUITES)} (default: backends)")
+    parser.add_argument("--sizes", default="100,1000,10000,100000", help="Comma-separated corpus sizes (backends)")
+    parser.add_argument("--large", action="store_true",
+                        help=f"Also time a {LARGE_SIZE:,}-row corpus (backends; takes minutes in pure Python)")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per corpus or data file (default: 200)")
+    parser.add_argument("--vocab", type=int, default=20000, help="Synthetic vocabulary size (default: 20000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs per measurement, best kept (engine)")
+    parser.add_argument("--top-k", type=int, default=MAX_RESULTS, help="Results per query (nDCG cutoff for relevance)")
+    parser.add_argument("--golden", default=str(GOLDEN_FILE), help="Golden query file (default: golden_queries.json)")
+    parser.add_argument("--baseline", help="JSON output of an earlier run to compare against")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+    args = parser.parse_args()
+    args.suites = args.suites or ["backends"]
+    unknown = [suite for suite in args.suites if suite not in SUITES]
+    if unknown:
+        parser.error(f"unknown suite: {', '.join(unknown)} (choose from {', '.join(SUITES)})")
+
+    golden = load_golden(args.golden) if {"engine", "relevance"} & set(args.suites) else []
+    report = {"python": ".".join(map(str, sys.version_info[:3])), "backend": core.BM25_BACKEND,
+              "tokenizer": core.TOKENIZER_STEPS}
+    for suite in dict.fromkeys(args.suites):
+        if suite == "backends":
+            sizes = [int(s) for s in args.sizes.split(",")] + ([LARGE_SIZE] if args.large else [])
+            report[suite] = run_backends(sorted(set(sizes)), args.queries, args.vocab, args.top_k)
+        elif suite == "engine":
+            report[suite] = run_engine(args.queries, args.repeat, args.top_k, golden)
+        else:
+            report[suite] = run_relevance(golden, args.top_k)
+
+    changes = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            changes = compare(report, json.load(f))
+        report["comparison"] = [{"metric": m, "baseline": old, "current": new} for m, old, new in changes]
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        sections = [FORMATTERS[suite](report[suite]) for suite in SUITES if suite in report]
+        if changes:
+            sections.append(format_comparison(changes))
+        print("\n\n".join(sections))
+
+    regressed = [m for m, old, new in changes if m.startswith("relevance.") and new < old]
+    if regressed:
+        print(f"Relevance regression: {', '.join(regressed)}", file=sys.stderr)
+        raise SystemExit(1)
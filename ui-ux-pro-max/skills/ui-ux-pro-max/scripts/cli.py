@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+UI/UX Pro Max CLI - argument parsing and output formatting behind search.py
+
+search.py is only a stub: Python compiles the script it runs from source on every
+invocation and only caches imported modules, so the CLI lives here.
+"""
+
+import argparse
+import os
+import sys
+from core import CSV_CONFIG, AVAILABLE_STACKS, ALL_DOMAINS, ALL_STACKS, DESIGN_SYSTEM, MAX_RESULTS, _parse_stacks
+from server import search_via_daemon
+
+
+# ============ OUTPUT ============
+VALUE_LIMIT = 300        # characters per Markdown value when no budget is set
+MIN_FIELD_BYTES = 40     # a truncated value shorter than this is dropped instead
+BYTES_PER_TOKEN = 4      # rough UTF-8 bytes per LLM token, for --max-tokens
+OMITTED_RESERVE = 80     # bytes kept back for the "results omitted" note
+
+
+def _size(text):
+    return len(text.encode("utf-8"))
+
+
+def _truncate(value, limit):
+    """value cut to at most limit UTF-8 bytes, ellipsis included"""
+    encoded = value.encode("utf-8")
+    if len(encoded) <= limit:
+        return value
+    return encoded[:max(limit - 3, 0)].decode("utf-8", "ignore") + "..."
+
+
+def fit_row(row, allowance, field_cost):
+    """Choose and trim a row's columns so they cost at most allowance bytes.
+
+    Columns that fit whole are kept first, in order; the space left then goes to
+    truncated copies of the long columns that were skipped. The first column is
+    always kept, so each result stays identifiable. Empty values are dropped.
+    """
+    items = [(key, str(value)) for key, value in row.items() if value not in (None, "")]
+    kept, used = {}, 0
+    for key, value in items:
+        cost = field_cost(key, value)
+        if used + cost <= allowance:
+            kept[key] = value
+            used += cost
+    for position, (key, value) in enumerate(items):
+        if key in kept:
+            continue
+        room = allowance - used - field_cost(key, "")
+        if room >= MIN_FIELD_BYTES or position == 0:
+            kept[key] = _truncate(value, max(room, MIN_FIELD_BYTES))
+            used += field_cost(key, kept[key])
+    return {key: kept[key] for key, _ in items if key in kept}
+
+
+def fit_rows(rows, budget, field_cost, row_cost):
+    """Yield (rank, row) trimmed so the rows together stay within budget bytes.
+
+    Each row gets an equal share of what is left (unused space rolls over to later
+    rows); a share too small for a useful row is raised to everything left, and
+    iteration stops once no further row fits.
+    """
+    remaining = budget - OMITTED_RESERVE
+    for rank, row in enumerate(rows, 1):
+        share = remaining // (len(rows) - rank + 1)
+        if share < row_cost(rank) + 2 * MIN_FIELD_BYTES:
+            share = remaining
+        fitted = fit_row(row, share - row_cost(rank), field_cost)
+        cost = row_cost(rank) + sum(field_cost(key, value) for key, value in fitted.items())
+        if cost > remaining:
+            return
+        remaining -= cost
+        yield rank, fitted
+
+
+def _markdown_field(key, value):
+    return f"- **{key}:** {value}\n"
+
+
+def iter_markdown(result, budget=None):
+    """Yield the Markdown response piece by piece, within budget bytes when given"""
+    if "error" in result:
+        yield f"Error: {result['error']}\n"
+        return
+
+    if result.get("domain") == DESIGN_SYSTEM:
+        header = f"## UI Pro Max Design System\n**Query:** {result['query']}"
+        header += f" | **Stack:** {result['stack']}\n" if result.get("stack") else "\n"
+    elif result.get("stack"):
+        header = f"## UI Pro Max Stack Guidelines\n**Stack:** {result['stack']} | **Query:** {result['query']}\n"
+    else:
+        header = f"## UI Pro Max Search Results\n**Domain:** {result['domain']} | **Query:** {result['query']}\n"
+    header += f"**Source:** {result['file']} | **Found:** {result['count']} results\n\n"
+    yield header
+
+    rows = result["results"]
+    if budget is None:
+        for rank, row in enumerate(rows, 1):
+            fields = "".join(_markdown_field(key, _clip(str(value))) for key, value in row.items())
+            yield f"### Result {rank}\n{fields}\n"
+        return
+
+    shown = 0
+    for rank, row in fit_rows(rows, budget - _size(header), lambda k, v: _size(_markdown_field(k, v)),
+                              lambda rank: _size(f"### Result {rank}\n\n")):
+        shown = rank
+        yield f"### Result {rank}\n" + "".join(_markdown_field(k, v) for k, v in row.items()) + "\n"
+    if shown < len(rows):
+        yield f"_{len(rows) - shown} more result(s) omitted to stay within the output budget._\n"
+
+
+def _clip(value):
+    return value[:VALUE_LIMIT] + "..." if len(value) > VALUE_LIMIT else value
+
+
+def iter_jsonl(result, budget=None):
+    """Yield compact JSON lines: the result's metadata, then one line per row (with its rank)"""
+    import json
+
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    header = dumps({key: value for key, value in result.items() if key != "results"})
+    yield header
+    rows = result.get("results", [])
+    if budget is None:
+        for rank, row in enumerate(rows, 1):
+            yield dumps({"rank": rank, **row})
+        return
+
+    shown = 0
+    for rank, row in fit_rows(rows, budget - _size(header), lambda k, v: _size(dumps({k: v})) - 2,
+                              lambda rank: _size(dumps({"rank": rank}))):
+        shown = rank
+        yield dumps({"rank": rank, **row})
+    if shown < len(rows):
+        yield dumps({"omitted": len(rows) - shown})
+
+
+def format_output(result, budget=None):
+    """Format results for Claude consumption (token-optimized)"""
+    return "".join(iter_markdown(result, budget))[:-1]
+
+
+def format_json(result, budget=None, indent=2):
+    """The result as one JSON document; with a budget, rows are trimmed like the other formats"""
+    import json
+
+    def dumps(obj):
+        return json.dumps(obj, indent=indent, ensure_ascii=False)
+
+    if budget is None or "results" not in result:
+        return dumps(result)
+
+    # Row fields sit three levels deep: newline, indent and trailing comma per field; newline,
+    # indent, braces and comma per row; the empty "[]" of the header grows a newline and indent
+    step = indent or 0
+    rows = result["results"]
+    header = dumps({**result, "results": []})
+    fitted = [row for _, row in fit_rows(rows, budget - _size(header) - step - 1,
+                                         lambda k, v: _size(f"{dumps(k)}: {dumps(v)}") + 3 * step + 2,
+                                         lambda rank: 4 * step + 4)]
+    while True:
+        out = {**result, "results": fitted}
+        if len(fitted) < len(rows):
+            out["omitted"] = len(rows) - len(fitted)
+        text = dumps(out)
+        if _size(text) <= budget or not fitted:
+            return text
+        fitted.pop()
+
+
+def write_output(result, fmt="markdown", budget=None, stream=None):
+    """Stream one result to stream (default stdout) in the chosen format"""
+    stream = stream or sys.stdout
+    if fmt == "json":
+        stream.write(format_json(result, budget and budget - 1) + "\n")  # the newline counts too
+    else:
+        for chunk in (iter_jsonl if fmt == "jsonl" else iter_markdown)(result, budget):
+            stream.write(chunk)
+    stream.flush()
+
+
+def stack_arg(value):
+    """argparse type for --stack: one stack, a comma-separated list, or 'all'"""
+    try:
+        stacks = _parse_stacks(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value if value == ALL_STACKS else ",".join(stacks)
+
+
+def read_batch(stream):
+    """Yield batch entries from JSON lines (objects or bare query strings).
+
+    A line that starts like a JSON object but does not parse yields an {"error": ...}
+    entry rather than being searched for as literal text.
+    """
+    import json
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield {"error": f"Invalid JSON on line {number}: {e}"} if line.startswith("{") else line
+
+
+def profile_startup(argv, request):
+    """Report cold-start cost: per-module import times and the first query's phases"""
+    import subprocess
+    import time
+    import core
+
+    argv = [arg for arg in argv if arg != "--profile-startup"]
+    start = time.perf_counter()
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "search.py")
+    proc = subprocess.run([sys.executable, "-X", "importtime", script, *argv, "--no-daemon"],
+                          capture_output=True, text=True)
+    process_s = time.perf_counter() - start
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[2].startswith(" ") or parts[2].startswith("  "):
+            continue
+        try:
+            imports.append((parts[2].strip(), int(parts[1])))
+        except ValueError:
+            continue  # header line
+    imports.sort(key=lambda item: item[1], reverse=True)
+
+    phases = []
+
+    def timed(label, fn):
+        t = time.perf_counter()
+        value = fn()
+        phases.append((label, time.perf_counter() - t))
+        return value
+
+    if request.get("stack") in core.STACK_CONFIG:
+        config = {"file": core.STACK_CONFIG[request["stack"]]["file"], **core._STACK_COLS}
+    elif request.get("stack"):
+        config = None  # several stacks: only the full search is timed
+    else:
+        domain = request.get("domain") or timed("detect domain", lambda: core.detect_domain(request["query"]))
+        config = core.CSV_CONFIG.get(domain)
+    if config is not None:
+        filepath = os.path.join(core.DATA_DIR, config["file"])
+        indexed = os.path.exists(core._with_suffix(filepath, core.INDEX_SUFFIX))
+        index = timed(f"load index ({config['file']}, {'from disk' if indexed else 'build'})",
+                      lambda: core.load_index(filepath, config["search_cols"]))
+        ranked = timed("score", lambda: index.bm25.score(request["query"], top_k=request["max_results"]))
+        timed("materialize rows", lambda: index.rows([idx for idx, _ in ranked], config["output_cols"]))
+    timed("full search() call", lambda: core._run_request(request))
+
+    lines = ["## Startup Profile",
+             f"**Process wall time (python -X importtime, no daemon):** {process_s * 1e3:.1f} ms", "",
+             "| Top-level import | Cumulative (ms) |", "|---|---|"]
+    if sys.flags.dont_write_bytecode:
+        lines[3:3] = ["PYTHONDONTWRITEBYTECODE is set: core and server are recompiled from source on every run.", ""]
+    lines += [f"| {name} | {us / 1e3:.2f} |" for name, us in imports[:10]]
+    lines += ["", "| First query phase | ms |", "|---|---|"]
+    lines += [f"| {label} | {seconds * 1e3:.3f} |" for label, seconds in phases]
+    print("\n".join(lines), file=sys.stderr)
+
+
+def main():
+    """Entry point of search.py"""
+    parser = argparse.ArgumentParser(description="UI Pro Max Search")
+    parser.add_argument("query", nargs="?", help="Search query")
+    parser.add_argument("--domain", "-d", choices=list(CSV_CONFIG.keys()) + [ALL_DOMAINS],
+                        help="Search domain ('all' merges every domain)")
+    parser.add_argument("--stack", "-s", type=stack_arg,
+                        help=f"Stack-specific search: {', '.join(AVAILABLE_STACKS)}; comma-separate several or use 'all'")
+    parser.add_argument("--max-results", "-n", type=int, default=MAX_RESULTS, help="Max results (default: 3)")
+    parser.add_argument("--generate", action="store_true",
+                        help="Build a design system (product, style, colors, typography, landing page, --stack guidelines)")
+    parser.add_argument("--include-stacks", action="store_true", help="With --domain all, also search every stack")
+    parser.add_argument("--json", dest="format", action="store_const", const="json", default="markdown", help="Output as JSON (same as --format json)")
+    parser.add_argument("--format", "-f", choices=["markdown", "json", "jsonl"], default="markdown",
+                        help="Output format; jsonl is a metadata line plus one compact line per result")
+    parser.add_argument("--max-bytes", type=int, help="Output budget in bytes: rows are trimmed column by column to fit")
+    parser.add_argument("--max-tokens", type=int, help=f"Output budget in tokens (~{BYTES_PER_TOKEN} bytes each)")
+    parser.add_argument("--serve", action="store_true", help="Run the search daemon on a Unix socket")
+    parser.add_argument("--stdio", action="store_true", help="Serve JSON-lines queries over stdin/stdout")
+    parser.add_argument("--socket", help="Daemon socket path (default: $UI_PRO_MAX_SOCKET, $XDG_RUNTIME_DIR or a per-user temp dir)")
+    parser.add_argument("--no-daemon", action="store_true", help="Always search in-process")
+    parser.add_argument("--batch", metavar="FILE", help="Run JSON-lines queries from FILE ('-' for stdin)")
+    parser.add_argument("--profile-startup", action="store_true", help="Report import and first-query timing on stderr")
+
+    args = parser.parse_args()
+    budget = args.max_bytes
+    if args.max_tokens is not None:
+        budget = min(budget or args.max_tokens * BYTES_PER_TOKEN, args.max_tokens * BYTES_PER_TOKEN)
+
+    if args.serve:
+        from server import serve_socket
+        serve_socket(args.socket)
+        return
+    if args.stdio:
+        from server import serve_stdio
+        serve_stdio()
+        return
+    if args.batch:
+        import json
+        from core import search_many
+
+        stream = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+        with stream:
+            requests = read_batch(stream)
+            if args.stack:
+                requests = ({"stack": args.stack, **r} if isinstance(r, dict) else {"query": r, "stack": args.stack}
+                            for r in requests)
+            if args.generate:
+                requests = ({**r, "generate": True} if isinstance(r, dict) else {"query": r, "generate": True}
+                            for r in requests)
+            for result in search_many(requests, args.domain, args.max_results):
+                if args.format == "markdown":
+                    write_output(result, budget=budget)
+                else:
+                    # One compact JSON object per query
+                    sys.stdout.write(format_json(result, budget and budget - 1, indent=None) + "\n")
+                    sys.stdout.flush()
+        return
+    if not args.query:
+        parser.error("the following arguments are required: query")
+
+    # Stack search takes priority
+    request = {"query": args.query, "max_results": args.max_results}
+    if args.generate:
+        request["generate"] = True
+    if args.stack:
+        request["stack"] = args.stack
+    elif args.domain:
+        request["domain"] = args.domain
+        if args.include_stacks:
+            request["include_stacks"] = True
+    if args.profile_startup:
+        profile_startup(sys.argv[1:], request)
+
+    result = search_via_daemon(request, path=args.socket, use_daemon=not args.no_daemon)
+
+    write_output(result, args.format, budget)
@@ -4,17 +4,77 @@
 UI/UX Pro Max Core - BM25 search engine for UI/UX style guides
 """
 
-import csv
+import heapq
+import marshal
+import mmap
+import os
 import re
 import sys
-from pathlib import Path
+import threading
 from math import log
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from itertools import accumulate
+
+# array, csv, hashlib, io, json, bisect and concurrent.futures are imported where needed:
+# a CLI query served from an up-to-date index never touches them, and they dominate
+# import time.
 
 # ============ CONFIGURATION ============
-DATA_DIR = Path(__file__).parent.parent / "data"
+# A str, not a pathlib.Path (pathlib alone cost more import time than the rest of core); use os.path.join
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
 MAX_RESULTS = 3
 
+# Compiled indexes are stored next to each CSV as "<name>.idx" (BM25) and "<name>.cols" (row values).
+# Both are written with marshal, so loading them is a single C-level unmarshal with no parsing.
+INDEX_SUFFIX = ".idx"
+COLUMNS_SUFFIX = ".cols"
+VECTORS_SUFFIX = ".vec"
+JOINS_SUFFIX = ".joins"
+INDEX_VERSION = 6
+
+# Result cache: entries kept in memory, plus an optional on-disk cache directory
+RESULT_CACHE_SIZE = 1024
+RESULT_CACHE_DIR = os.environ.get("UI_PRO_MAX_CACHE_DIR")
+
+# Scoring backend: "python" (default) or "numpy" (sparse matrix, needs NumPy; SciPy optional)
+BM25_BACKEND = os.environ.get("UI_PRO_MAX_BACKEND", "python")
+
+# Fuzzy matching (opt-in): query tokens missing from an index's vocabulary are expanded to
+# vocabulary terms they prefix or are within a small edit distance of ("glassmorph", "neumorphic",
+# typos). Expansions count for at most FUZZY_WEIGHT of an exact hit, so they never outrank one.
+FUZZY_MATCHING = os.environ.get("UI_PRO_MAX_FUZZY", "0") == "1"
+FUZZY_MIN_LENGTH = 4
+FUZZY_MAX_EXPANSIONS = 3
+FUZZY_LONG_TOKEN = 8      # tokens at least this long may be 2 edits away, shorter ones 1
+FUZZY_WEIGHT = 0.3
+EXPANSION_CACHE_SIZE = 4096
+
+# Semantic reranking (needs NumPy): BM25's top RERANK_DEPTH rows, plus rows whose cosine
+# similarity to the query in an LSA embedding of the data reaches RERANK_MIN_SIMILARITY, are
+# reordered by a blend of normalized BM25 score and cosine (RERANK_WEIGHT is the cosine's share)
+RERANK = os.environ.get("UI_PRO_MAX_RERANK", "0") == "1"
+RERANK_DEPTH = 20
+RERANK_WEIGHT = 0.5
+RERANK_MIN_SIMILARITY = 0.4
+LSA_DIMENSIONS = 32
+
+# Ranking: "bm25" (search_cols concatenated, default) or "bm25f" (each search column a weighted field)
+RANKING = os.environ.get("UI_PRO_MAX_RANKING", "bm25")
+
+# BM25F field weights by column name (unlisted columns weigh 1.0); UI_PRO_MAX_FIELD_WEIGHTS
+# overrides entries, e.g. "Keywords=3,Notes=0.5"
+FIELD_WEIGHTS = {
+    "Style Category": 3.0, "Product Type": 3.0, "Pattern Name": 3.0, "Data Type": 3.0,
+    "Font Pairing Name": 3.0, "Issue": 3.0, "Guideline": 3.0,
+    "Keywords": 2.0, "AI Prompt Keywords (Copy-Paste Ready)": 2.0, "Mood/Style Keywords": 2.0,
+    "Description": 0.7, "Notes": 0.5, "Key Considerations": 0.5, "Accessibility Notes": 0.5,
+    "Conversion Optimization": 0.5, "Section Order": 0.5, "Do": 0.5, "Don't": 0.3,
+}
+for _item in filter(None, os.environ.get("UI_PRO_MAX_FIELD_WEIGHTS", "").split(",")):
+    _col, _, _weight = _item.rpartition("=")
+    FIELD_WEIGHTS[_col.strip()] = float(_weight)
+
 CSV_CONFIG = {
     "style": {
         "file": "styles.csv",
@@ -77,174 +137,1690 @@ _STACK_COLS = {
 
 AVAILABLE_STACKS = list(STACK_CONFIG.keys())
 
+# Pseudo-domain that searches every CSV_CONFIG domain at once, and pseudo-stack for every stack
+ALL_DOMAINS = "all"
+ALL_STACKS = "all"
+
+# Cross-references between data files: (domain, column) -> [(target domain, target key column), ...].
+# A cell may name several target rows ("Glassmorphism + Flat Design", "Soft UI Evolution, Minimalism");
+# each name resolves to the first target with a matching key. Landing page patterns are named
+# after landing.csv patterns or the landing-page styles of styles.csv.
+JOINS = {
+    ("product", "Primary Style Recommendation"): [("style", "Style Category")],
+    ("product", "Secondary Styles"): [("style", "Style Category")],
+    ("product", "Landing Page Pattern"): [("landing", "Pattern Name"), ("style", "Style Category")],
+    ("product", "Product Type"): [("color", "Product Type")],
+    ("prompt", "Style Category"): [("style", "Style Category")],
+}
+# Names that match no key exactly or as a prefix resolve to the most similar key (trigram Dice)
+JOIN_MIN_SIMILARITY = 0.5
+
+# Sections of a generated design system, in output order
+DESIGN_SYSTEM = "design-system"
+DESIGN_SECTIONS = ["Product", "Style", "Colors", "Typography", "Landing Page", "Stack"]
+
+
+# ============ TOKENIZER ============
+_PUNCT_RE = re.compile(r'[^\w\s]')
+QUERY_CACHE_SIZE = 4096
+
+_STOPWORDS = frozenset("""
+    and are but for from has have into its not of off our out than that the their them then there
+    these they this those too very was were what when where which while who why will with you your
+""".split())
+
+_SUFFIXES = ("ational", "ization", "fulness", "ousness", "iveness", "ments", "ment",
+             "ings", "ing", "edly", "ed", "ies", "es", "ly", "s")
+
+
+def _step_stopwords(tokens):
+    """Drop common English function words"""
+    return [t for t in tokens if t not in _STOPWORDS]
+
+
+def _step_stem(tokens):
+    """Light suffix-stripping stemmer (animations -> animation, responsive stays)"""
+    stemmed = []
+    for token in tokens:
+        for suffix in _SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                if suffix == "ies":
+                    token = token[:-3] + "y"
+                elif not (suffix == "s" and token.endswith("ss")):
+                    token = token[:-len(suffix)]
+                break
+        stemmed.append(token)
+    return stemmed
+
+
+def _step_bigrams(tokens):
+    """Append adjacent-token bigrams ("dark_mode") after the unigrams"""
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+
+# Optional pipeline stages, applied in the configured order after splitting
+TOKEN_STEPS = {
+    "stopwords": _step_stopwords,
+    "stem": _step_stem,
+    "bigrams": _step_bigrams,
+}
+
+# Comma-separated TOKEN_STEPS names; empty keeps plain lowercase word tokens
+TOKENIZER_STEPS = [s for s in os.environ.get("UI_PRO_MAX_TOKENIZER", "").split(",") if s]
+
+
+class Tokenizer:
+    """Tokenization pipeline: lowercase, strip punctuation, drop short words, then optional steps"""
+
+    def __init__(self, steps=()):
+        unknown = [s for s in steps if s not in TOKEN_STEPS]
+        if unknown:
+            raise ValueError(f"Unknown tokenizer step(s): {', '.join(unknown)}. Available: {', '.join(TOKEN_STEPS)}")
+        self.steps = list(steps)
+        self._pipeline = [TOKEN_STEPS[s] for s in self.steps]
+        self.tokenize_query = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._tokenize_query)
+
+    def tokenize(self, text):
+        """Tokenize a document (uncached)"""
+        text = _PUNCT_RE.sub(' ', str(text).lower())
+        tokens = [w for w in text.split() if len(w) > 2]
+        for step in self._pipeline:
+            tokens = step(tokens)
+        return tokens
+
+    def _tokenize_query(self, text):
+        return tuple(self.tokenize(text))
+
+
+_TOKENIZERS = {}
+
+
+def get_tokenizer(steps=None):
+    """Shared Tokenizer per step configuration, so its query cache is reused across indexes"""
+    key = tuple(TOKENIZER_STEPS if steps is None else steps)
+    if key not in _TOKENIZERS:
+        _TOKENIZERS[key] = Tokenizer(key)
+    return _TOKENIZERS[key]
+
 
 # ============ BM25 IMPLEMENTATION ============
+def _import_numpy():
+    """Return (numpy, scipy.sparse) modules, None for any that is not installed"""
+    try:
+        import numpy
+    except ImportError:
+        return None, None
+    try:
+        from scipy import sparse
+    except ImportError:
+        sparse = None
+    return numpy, sparse
+
+
 class BM25:
     """BM25 ranking algorithm for text search"""
 
-    def __init__(self, k1=1.5, b=0.75):
+    def __init__(self, k1=1.5, b=0.75, backend="python", tokenizer=None, field_weights=None):
         self.k1 = k1
         self.b = b
-        self.corpus = []
+        # BM25F: documents are sequences of fields with these weights, each length-normalized
+        # against its own average; the weighted term frequency is precomputed into the postings
+        self.field_weights = list(field_weights) if field_weights else None
+        self.backend = backend
+        if backend == "numpy" and _import_numpy()[0] is None:
+            self.backend = "python"
+        self.tokenizer = tokenizer or get_tokenizer()
+        self._matrix = None
         self.doc_lengths = []
         self.avgdl = 0
-        self.idf = {}
-        self.doc_freqs = defaultdict(int)
+        # Terms are interned and mapped to integer IDs; idf/postings are indexed by term ID
+        self.vocab = {}
+        self.idf = []
+        self.postings = []
+        self.length_norms = None
         self.N = 0
+        self._term_index = None
+        self.expand_term = lru_cache(maxsize=EXPANSION_CACHE_SIZE)(self._expand_term)
 
     def tokenize(self, text):
-        """Lowercase, split, remove punctuation, filter short words"""
-        text = re.sub(r'[^\w\s]', ' ', str(text).lower())
-        return [w for w in text.split() if len(w) > 2]
+        """Tokenize text with this index's tokenizer pipeline"""
+        return self.tokenizer.tokenize(text)
 
     def fit(self, documents):
-        """Build BM25 index from documents"""
-        self.corpus = [self.tokenize(doc) for doc in documents]
-        self.N = len(self.corpus)
+        """Build BM25 index from documents (sequences of field texts in BM25F mode)"""
+        if self.field_weights:
+            return self._fit_fields(documents)
+        corpus = [self.tokenizer.tokenize(doc) for doc in documents]
+        self.N = len(corpus)
+        if self.N == 0:
+            return
+        self.doc_lengths = [len(doc) for doc in corpus]
+        for idx, doc in enumerate(corpus):
+            self._add_postings(idx, _term_freqs(doc))
+        self._finalize()
+
+    def _fit_fields(self, documents):
+        """BM25F: tf~ = sum over fields of weight * tf / (1 - b + b * field_len / avg_field_len)"""
+        corpus = [[self.tokenizer.tokenize(text) for text in doc] for doc in documents]
+        self.N = len(corpus)
         if self.N == 0:
             return
-        self.doc_lengths = [len(doc) for doc in self.corpus]
+        self.doc_lengths = [sum(len(field) for field in doc) for doc in corpus]
+        n_fields = len(self.field_weights)
+        avg_lengths = [sum(len(doc[f]) for doc in corpus) / self.N or 1 for f in range(n_fields)]
+        b = self.b
+        for idx, doc in enumerate(corpus):
+            term_freqs = defaultdict(float)
+            for tokens, weight, avg_len in zip(doc, self.field_weights, avg_lengths):
+                if tokens:
+                    field_tf = weight / (1 - b + b * len(tokens) / avg_len)
+                    for word in tokens:
+                        term_freqs[word] += field_tf
+            self._add_postings(idx, term_freqs)
+        self._finalize()
+
+    def updated(self, documents, reuse, removed=None):
+        """Return a BM25 for a new document list, tokenizing only documents that changed.
+
+        reuse[i] is the index of an old document whose text equals documents[i], or None
+        for a new or edited one; old documents nobody reuses are deleted. removed, the
+        text of those deleted documents, lets appends and in-place edits patch just the
+        affected postings instead of renumbering all of them. df, idf and avgdl are then
+        recomputed. This index is left untouched, so concurrent queries stay consistent.
+        """
+        bm25 = BM25(self.k1, self.b, self.backend, self.tokenizer)
+        remap = {old: new for new, old in enumerate(reuse) if old is not None}
+        dropped = [idx for idx in range(self.N) if idx not in remap]
+        bm25.vocab = dict(self.vocab)
+        bm25.postings = self._postings_without(dropped, removed, remap)
+        bm25.doc_lengths = [0 if old is None else self.doc_lengths[old] for old in reuse]
+        bm25.N = len(documents)
+
+        touched = set()
+        for idx, old in enumerate(reuse):
+            if old is None:
+                tokens = bm25.tokenizer.tokenize(documents[idx])
+                bm25.doc_lengths[idx] = len(tokens)
+                for term in set(tokens):
+                    term_id = bm25.vocab.get(term)
+                    if term_id is not None and term_id not in touched:
+                        bm25.postings[term_id] = list(bm25.postings[term_id])  # copy before appending
+                touched.update(bm25._add_postings(idx, _term_freqs(tokens)))
+        for term_id in touched:
+            bm25.postings[term_id].sort()
+
+        # Drop terms that only occurred in deleted documents
+        live = [term_id for term_id, plist in enumerate(bm25.postings) if plist]
+        if len(live) < len(bm25.postings):
+            new_ids = {term_id: new for new, term_id in enumerate(live)}
+            bm25.vocab = {term: new_ids[term_id] for term, term_id in bm25.vocab.items() if term_id in new_ids}
+            bm25.postings = [bm25.postings[term_id] for term_id in live]
+        if bm25.N:
+            bm25._finalize()
+        return bm25
+
+    def _postings_without(self, dropped, removed, remap):
+        """Postings with the dropped documents removed and the rest renumbered via remap"""
+        if removed is not None and len(removed) == len(dropped) and all(old == new for old, new in remap.items()):
+            # Kept documents did not move: filter only the postings of the dropped documents' terms,
+            # trusting the result only if it accounts for every token of those documents
+            gone, freed = set(dropped), 0
+            postings = list(self.postings)
+            for term in {term for text in removed for term in self.tokenizer.tokenize(text)}:
+                term_id = self.vocab.get(term)
+                if term_id is not None:
+                    freed += sum(tf for idx, tf in postings[term_id] if idx in gone)
+                    postings[term_id] = [(idx, tf) for idx, tf in postings[term_id] if idx not in gone]
+            if freed == sum(self.doc_lengths[idx] for idx in dropped):
+                return postings
+        return [[(remap[idx], tf) for idx, tf in plist if idx in remap] for plist in self.postings]
+
+    def _add_postings(self, idx, term_freqs):
+        """Append document idx's term frequencies to the postings; returns its term IDs"""
+        vocab, postings = self.vocab, self.postings
+        term_ids = []
+        for word, tf in term_freqs.items():
+            term_id = vocab.get(word)
+            if term_id is None:
+                term_id = vocab[sys.intern(word)] = len(postings)
+                postings.append([])
+            postings[term_id].append((idx, tf))
+            term_ids.append(term_id)
+        return term_ids
+
+    def _finalize(self):
+        """Derive avgdl, idf and length norms (and the numpy matrix) from the postings"""
         self.avgdl = sum(self.doc_lengths) / self.N
+        self.idf = [log((self.N - len(plist) + 0.5) / (len(plist) + 0.5) + 1) for plist in self.postings]
+        self.length_norms = self._length_norms()
+        if self.backend == "numpy":
+            self._build_matrix()
 
-        for doc in self.corpus:
-            seen = set()
-            for word in doc:
-                if word not in seen:
-                    self.doc_freqs[word] += 1
-                    seen.add(word)
+    def doc_freq(self, term):
+        """Number of documents containing term"""
+        term_id = self.vocab.get(term)
+        return 0 if term_id is None else len(self.postings[term_id])
 
-        for word, freq in self.doc_freqs.items():
-            self.idf[word] = log((self.N - freq + 0.5) / (freq + 0.5) + 1)
+    def _length_norms(self):
+        """Precompute the BM25 length normalization term for every document"""
+        k1, b, avgdl = self.k1, self.b, self.avgdl
+        if self.field_weights:
+            return [k1] * self.N  # BM25F normalizes per field, inside the postings' tf
+        return [k1 * (1 - b + b * doc_len / avgdl) for doc_len in self.doc_lengths]
 
-    def score(self, query):
-        """Score all documents against query"""
-        query_tokens = self.tokenize(query)
-        scores = []
+    def _query_terms(self, query, idf):
+        """(term_id, idf weight) per query token found in (or expanded into) the vocabulary, repeats kept"""
+        terms = []
+        for token in self.tokenizer.tokenize_query(query):
+            for term, term_id, match_weight in self.match_term(token):
+                weight = self.idf[term_id] if idf is None else idf.get(term)
+                if weight is not None:
+                    terms.append((term_id, weight * match_weight))
+        return terms
 
-        for idx, doc in enumerate(self.corpus):
-            score = 0
-            doc_len = self.doc_lengths[idx]
-            term_freqs = defaultdict(int)
-            for word in doc:
-                term_freqs[word] += 1
+    def match_term(self, token):
+        """(term, term_id, weight) for a query token: itself (1.0) if indexed, else its fuzzy expansions"""
+        term_id = self.vocab.get(token)
+        if term_id is not None:
+            return ((token, term_id, 1.0),)
+        return self.expand_term(token) if FUZZY_MATCHING else ()
 
-            for token in query_tokens:
-                if token in self.idf:
-                    tf = term_freqs[token]
-                    idf = self.idf[token]
-                    numerator = tf * (self.k1 + 1)
-                    denominator = tf + self.k1 * (1 - self.b + self.b * doc_len / self.avgdl)
-                    score += idf * numerator / denominator
+    # ----- fuzzy term expansion -----
+    def _build_term_index(self):
+        self._term_index = _term_index(self.vocab)
+        return self._term_index
 
-            scores.append((idx, score))
+    def _expand_term(self, token):
+        """Closest vocabulary terms to an unknown token, best first, weighted down (cached per index)"""
+        if len(token) < FUZZY_MIN_LENGTH or self.N == 0:
+            return ()
+        terms, grams = self._term_index or self._build_term_index()
+        matches = _fuzzy_candidates(token, terms, grams)
+        best = heapq.nlargest(FUZZY_MAX_EXPANSIONS, matches.items(), key=lambda item: (item[1], -len(item[0]), item[0]))
+        return tuple((term, self.vocab[term], FUZZY_WEIGHT * similarity) for term, similarity in best)
 
-        return sorted(scores, key=lambda x: x[1], reverse=True)
+    def score(self, query, top_k=None, idf=None):
+        """Score documents containing a query token, best first (ties keep doc order).
 
+        Cost follows postings length, not corpus size; top_k uses a bounded heap.
+        idf overrides the fitted table ({term: weight}), e.g. with statistics shared across indexes.
+        """
+        if self.N == 0:
+            return []
+        query_terms = self._query_terms(query, idf)
+        if self._matrix is not None:
+            return self._score_matrix(query_terms, top_k)
+        norms = self.length_norms
+        k1_plus_1 = self.k1 + 1
+        scores = {}
 
-# ============ SEARCH FUNCTIONS ============
-def _load_csv(filepath):
-    """Load CSV and return list of dicts with error handling"""
+        for term_id, weight in query_terms:
+            for idx, tf in self.postings[term_id]:
+                scores[idx] = scores.get(idx, 0.0) + weight * (tf * k1_plus_1) / (tf + norms[idx])
+
+        def rank_key(item):
+            return item[1], -item[0]
+
+        if top_k is None:
+            return sorted(scores.items(), key=rank_key, reverse=True)
+        return heapq.nlargest(top_k, scores.items(), key=rank_key)
+
+    def score_many(self, queries, top_k=None, idf=None):
+        """Score several queries; the numpy backend does it as one sparse matrix product"""
+        if self._matrix is None or self._sparse is None or self.N == 0:
+            return [self.score(query, top_k, idf) for query in queries]
+        np = self._np
+        rows, cols, weights = [], [], []
+        for col, query in enumerate(queries):
+            for term_id, weight in self._query_terms(query, idf):
+                rows.append(term_id)
+                cols.append(col)
+                weights.append(weight)
+        query_matrix = self._sparse.csc_matrix(
+            (np.array(weights, dtype=np.float64), (rows, cols)), shape=(len(self.postings), len(queries)))
+        scores = (self._matrix @ query_matrix).tocsc()
+        ranked = []
+        for col in range(len(queries)):
+            start, end = scores.indptr[col], scores.indptr[col + 1]
+            ranked.append(self._top_k(scores.indices[start:end], scores.data[start:end], top_k))
+        return ranked
+
+    # ----- numpy backend -----
+    def _build_matrix(self):
+        """Store the corpus as a sparse doc-term matrix of precomputed BM25 tf weights"""
+        np, sparse = _import_numpy()
+        self._np, self._sparse = np, sparse
+        indptr, doc_ids, tfs = [0], [], []
+        for plist in self.postings:
+            for idx, tf in plist:
+                doc_ids.append(idx)
+                tfs.append(tf)
+            indptr.append(len(doc_ids))
+        doc_ids = np.array(doc_ids, dtype=np.int64)
+        tfs = np.array(tfs, dtype=np.float64)
+        norms = np.array(self.length_norms, dtype=np.float64)
+        weights = tfs * (self.k1 + 1) / (tfs + norms[doc_ids])
+        indptr = np.array(indptr, dtype=np.int64)
+        if sparse is not None:
+            # CSR doc x term matrix: scores = W @ q
+            self._matrix = sparse.csc_matrix((weights, doc_ids, indptr), shape=(self.N, len(self.postings))).tocsr()
+        else:
+            # Without SciPy keep the CSC arrays and accumulate columns directly
+            self._matrix = (indptr, doc_ids, weights)
+
+    def _score_matrix(self, query_terms, top_k):
+        """Vectorized score(): sparse matrix-vector product over the query's terms"""
+        np = self._np
+        query_vector = {}
+        for term_id, weight in query_terms:
+            query_vector[term_id] = query_vector.get(term_id, 0.0) + weight
+        if not query_vector:
+            return []
+
+        if self._sparse is not None:
+            q = np.zeros(len(self.postings), dtype=np.float64)
+            q[list(query_vector)] = list(query_vector.values())
+            scores = self._matrix @ q
+        else:
+            indptr, doc_ids, weights = self._matrix
+            scores = np.zeros(self.N, dtype=np.float64)
+            for term_id, weight in query_vector.items():
+                start, end = indptr[term_id], indptr[term_id + 1]
+                scores[doc_ids[start:end]] += weights[start:end] * weight
+        hits = np.flatnonzero(scores > 0)
+        return self._top_k(hits, scores[hits], top_k)
+
+    def _top_k(self, doc_ids, scores, top_k):
+        """(doc_idx, score) pairs best first, ties by doc order, matching the Python path"""
+        np = self._np
+        if top_k is not None and top_k < len(scores):
+            if top_k <= 0:
+                return []
+            threshold = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+            keep = scores >= threshold
+            doc_ids, scores = doc_ids[keep], scores[keep]
+        order = np.lexsort((doc_ids, -scores))[:top_k]
+        return [(int(doc_ids[i]), float(scores[i])) for i in order]
+
+    def to_dict(self):
+        """Serialize fitted statistics for the persisted index"""
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "field_weights": self.field_weights,
+            "N": self.N,
+            "avgdl": self.avgdl,
+            "doc_lengths": self.doc_lengths,
+            "vocab": self.vocab,
+            "idf": self.idf,
+            "postings": self.postings,
+        }
+
+    @classmethod
+    def from_dict(cls, data, backend="python", tokenizer=None):
+        """Restore a fitted BM25 from to_dict() output without refitting"""
+        bm25 = cls(data["k1"], data["b"], backend, tokenizer, data["field_weights"])
+        bm25.N = data["N"]
+        bm25.avgdl = data["avgdl"]
+        bm25.doc_lengths = data["doc_lengths"]
+        bm25.vocab = data["vocab"]
+        bm25.idf = data["idf"]
+        bm25.postings = data["postings"]
+        bm25.length_norms = bm25._length_norms()
+        if bm25.backend == "numpy" and bm25.N:
+            bm25._build_matrix()
+        return bm25
+
+
+def _term_index(vocabulary):
+    """Sorted vocabulary (prefix ranges via bisect) and a character-trigram -> terms index"""
+    terms = sorted(vocabulary)
+    grams = defaultdict(list)
+    for term in terms:
+        for gram in _trigrams(term):
+            grams[gram].append(term)
+    return terms, grams
+
+
+def _fuzzy_candidates(token, terms, grams):
+    """{term: similarity} for every term a fuzzy query token may expand to.
+
+    terms is the sorted vocabulary and grams its trigram -> terms index. Terms the token
+    is a prefix of score len(token) / len(term); terms within the edit budget (1 for
+    tokens shorter than FUZZY_LONG_TOKEN, else 2) score 1 - edits / longer length. Only
+    terms sharing at least half of the trigrams of both words get the edit distance check,
+    so "chart" reaches neither "chat" nor "charm", and unrelated words are not compared.
+    """
+    from bisect import bisect_left
+
+    matches = {}
+    start = bisect_left(terms, token)
+    for term in terms[start:]:
+        if not term.startswith(token):
+            break
+        matches[term] = len(token) / len(term)
+
+    max_edits = 1 if len(token) < FUZZY_LONG_TOKEN else 2
+    token_grams = _trigrams(token)
+    shared = defaultdict(int)
+    for gram in token_grams:
+        for term in grams.get(gram, ()):
+            shared[term] += 1
+    # Each edit changes at most three trigrams; on top of that, token and term must share
+    # at least half of their trigrams together (a term of n letters has n padded trigrams)
+    min_shared = len(token_grams) - 3 * max_edits
+    for term, count in shared.items():
+        if (count < min_shared or 3 * count < len(token_grams) + len(term)
+                or abs(len(term) - len(token)) > max_edits):
+            continue
+        edits = _edit_distance(token, term, max_edits)
+        if edits <= max_edits:
+            similarity = 1 - edits / max(len(term), len(token))
+            matches[term] = max(similarity, matches.get(term, 0))
+    return matches
+
+
+def _trigrams(term):
+    padded = f" {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b, max_dist):
+    """Levenshtein distance of a and b, or max_dist + 1 once it is known to exceed max_dist"""
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > max_dist:
+            return max_dist + 1
+        previous = current
+    return previous[-1]
+
+
+def _term_freqs(tokens):
+    term_freqs = defaultdict(int)
+    for word in tokens:
+        term_freqs[word] += 1
+    return term_freqs
+
+
+# ============ PERSISTED INDEX ============
+# Paths are plain strings: pathlib alone costs about a third of core's import time.
+def _with_suffix(filepath, suffix):
+    return os.path.splitext(filepath)[0] + suffix
+
+
+def _read_bytes(filepath):
+    with open(filepath, 'rb') as f:
+        return f.read()
+
+
+def _file_signature(filepath, with_hash=True):
+    """Return (mtime, size[, sha1]) used to detect changes to a data file"""
+    stat = os.stat(filepath)
+    signature = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+    if with_hash:
+        signature["sha1"] = _sha1(_read_bytes(filepath))
+    return signature
+
+
+def _sha1(data):
+    import hashlib
+    return hashlib.sha1(data).hexdigest()
+
+
+def _read_csv(filepath):
+    """Read CSV rows and the SHA-1 of the exact bytes they were parsed from"""
+    import csv
+    import io
+
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    reader = csv.DictReader(io.StringIO(raw.decode('utf-8'), newline=''))
+    rows = list(reader)
+    return reader.fieldnames or [], rows, _sha1(raw)
+
+
+def _signature_for(filepath, sha1):
+    """Signature of filepath whose contents were already hashed while parsing"""
+    signature = _file_signature(filepath, with_hash=False)
+    signature["sha1"] = sha1
+    return signature
+
+
+def _document(row, search_cols):
+    """Text indexed for one row: its search columns joined"""
+    return " ".join(str(row.get(col, "")) for col in search_cols)
+
+
+def _field_weights(search_cols):
+    """Per-column BM25F weights for search_cols, or None when ranking with plain BM25"""
+    if RANKING != "bm25f":
+        return None
+    return [FIELD_WEIGHTS.get(col, 1.0) for col in search_cols]
+
+
+def _digests(documents):
+    """8-byte BLAKE2 digest of each document, to match unchanged rows across CSV edits"""
+    from hashlib import blake2b
+    return [blake2b(doc.encode('utf-8'), digest_size=8).digest() for doc in documents]
+
+
+def _write_atomic(path, write):
+    """Write path via a temp file + rename; failures (e.g. read-only install) are ignored.
+
+    The temp name is unique per process, thread and call, and is created exclusively,
+    so daemon threads persisting the same artifact never share (and rename) a
+    half-written file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.{os.urandom(4).hex()}.tmp"
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return list(csv.DictReader(f))
-    except FileNotFoundError:
-        return []
-    except (csv.Error, UnicodeDecodeError) as e:
-        print(f"Warning: Error reading {filepath}: {e}", file=sys.stderr)
-        return []
-    except Exception as e:
-        print(f"Warning: Unexpected error reading {filepath}: {e}", file=sys.stderr)
-        return []
+        with open(tmp_path, 'xb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        return False
 
 
-def _search_csv(filepath, search_cols, output_cols, query, max_results):
-    """Core search function using BM25 with comprehensive error handling"""
-    if not filepath.exists():
-        return []
+class ColumnStore:
+    """Column-oriented copy of a CSV: every column stored separately, cells decoded on demand.
 
-    data = _load_csv(filepath)
-    if not data:
-        return []
+    Ranking only needs the BM25 postings, so row values are touched just for the
+    winners, one column at a time. On disk ("<name>.cols") each column is a UTF-8
+    blob plus a uint32 offset table, memory-mapped so heavy columns such as code
+    examples are never read unless a winning row asks for them.
+    """
+
+    MAGIC = b"UIPCOLS2"
+
+    def __init__(self, fieldnames, n_rows):
+        self.fieldnames = list(fieldnames)
+        self.n_rows = n_rows
+        self._columns = None   # in-memory: {name: [values]}
+        self._mmap = None      # on-disk: mmap + {name: (offsets, data_start)}
+        self._layout = None
+
+    def __len__(self):
+        return self.n_rows
+
+    @classmethod
+    def from_rows(cls, fieldnames, rows):
+        """In-memory store built from parsed CSV rows"""
+        store = cls(fieldnames, len(rows))
+        store._columns = {col: [row.get(col) or "" for row in rows] for col in store.fieldnames}
+        return store
+
+    def save(self, path, sha1):
+        """Serialize to the memory-mappable layout; returns False if it could not be written"""
+        from array import array
+
+        blobs, layout, position = [], [], 0
+        for col in self.fieldnames:
+            values = self._column_values(col)
+            data = "".join(values).encode('utf-8')
+            # ASCII columns (the common case) have byte offsets equal to character offsets
+            lengths = map(len, values) if len(data) == sum(map(len, values)) else (
+                len(value.encode('utf-8')) for value in values)
+            offsets = array('I', accumulate(lengths, initial=0))
+            blobs.append((offsets.tobytes(), data))
+            layout.append([position, position + len(blobs[-1][0])])
+            position += len(blobs[-1][0]) + len(blobs[-1][1])
+        header = marshal.dumps({"fieldnames": self.fieldnames, "rows": self.n_rows, "sha1": sha1,
+                                "byteorder": sys.byteorder, "layout": layout})
+
+        def write(f):
+            f.write(self.MAGIC + len(header).to_bytes(4, 'little') + header)
+            for offsets, data in blobs:
+                f.write(offsets)
+                f.write(data)
+        return _write_atomic(path, write)
+
+    @classmethod
+    def open(cls, path, sha1):
+        """Memory-map a saved store; None if missing or built from different CSV contents"""
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            if mapped[:len(cls.MAGIC)] != cls.MAGIC:
+                raise ValueError("bad magic")
+            start = len(cls.MAGIC) + 4
+            header_len = int.from_bytes(mapped[len(cls.MAGIC):start], 'little')
+            header = marshal.loads(mapped[start:start + header_len])
+            if header["sha1"] != sha1 or header["byteorder"] != sys.byteorder:
+                raise ValueError("stale store")
+        except (ValueError, KeyError, EOFError, TypeError):
+            mapped.close()
+            return None
+
+        body = start + header_len
+        store = cls(header["fieldnames"], header["rows"])
+        store._mmap = mapped
+        view = memoryview(mapped)
+        store._layout = {}
+        for col, (offsets_pos, data_pos) in zip(store.fieldnames, header["layout"]):
+            offsets = view[body + offsets_pos:body + data_pos].cast('I')
+            store._layout[col] = (offsets, body + data_pos)
+        return store
+
+    def _column_values(self, col):
+        if self._columns is not None:
+            return self._columns[col]
+        return [self.value(col, idx) for idx in range(self.n_rows)]
+
+    def value(self, col, idx):
+        """Decode one cell"""
+        if self._columns is not None:
+            return self._columns[col][idx]
+        offsets, data_pos = self._layout[col]
+        return self._mmap[data_pos + offsets[idx]:data_pos + offsets[idx + 1]].decode('utf-8')
+
+    def row(self, idx, columns=None):
+        """Materialize one row as a dict of the requested (default: all) columns"""
+        columns = self.fieldnames if columns is None else [c for c in columns if c in self.fieldnames]
+        return {col: self.value(col, idx) for col in columns}
+
+
+class SearchIndex:
+    """Compiled BM25 index for one data file, persisted next to the CSV"""
+
+    def __init__(self, filepath, search_cols, bm25, columns, signature, digests):
+        self.filepath = str(filepath)
+        self.search_cols = list(search_cols)
+        self.bm25 = bm25
+        self.columns = columns
+        self.signature = signature
+        self.digests = digests  # per-row digest of the indexed text, for incremental updates
+        self._vectors = None
+
+    @property
+    def index_path(self):
+        return _with_suffix(self.filepath, INDEX_SUFFIX)
+
+    @property
+    def columns_path(self):
+        return _with_suffix(self.filepath, COLUMNS_SUFFIX)
+
+    @classmethod
+    def build(cls, filepath, search_cols):
+        """Parse the CSV and fit a fresh BM25 over its search columns"""
+        fieldnames, rows, sha1 = _read_csv(filepath)
+        documents = [_document(row, search_cols) for row in rows]
+        bm25 = BM25(backend=BM25_BACKEND, field_weights=_field_weights(search_cols))
+        bm25.fit([[str(row.get(col, "")) for col in search_cols] for row in rows] if bm25.field_weights else documents)
+        return cls(filepath, search_cols, bm25, ColumnStore.from_rows(fieldnames, rows),
+                   _signature_for(filepath, sha1), _digests(documents))
+
+    def refreshed(self):
+        """Return an up-to-date copy of a stale index by diffing the CSV against the indexed rows.
+
+        Rows whose search text is unchanged keep their postings (matched in order, so
+        appends, edits and deletions anywhere are handled); only new or edited rows
+        are tokenized. Returns None if a full build is needed (the CSV's columns changed, or BM25F).
+        """
+        if self.bm25.field_weights:
+            return None  # BM25F field averages shift with every row: refit
+        fieldnames, rows, sha1 = _read_csv(self.filepath)
+        if fieldnames != self.columns.fieldnames:
+            return None
+        documents = [_document(row, self.search_cols) for row in rows]
+        digests = _digests(documents)
+        old_ids = defaultdict(list)
+        for idx in range(len(self.digests) - 1, -1, -1):
+            old_ids[self.digests[idx]].append(idx)
+        reuse = [old_ids[digest].pop() if old_ids.get(digest) else None for digest in digests]
+
+        # Only the deleted rows' old text is decoded, to find the postings they occupy
+        dropped = sorted(set(range(len(self.digests))).difference(reuse))
+        removed = [_document(row, self.search_cols) for row in self.rows(dropped, self.search_cols)]
+        index = SearchIndex(self.filepath, self.search_cols, self.bm25.updated(documents, reuse, removed),
+                            ColumnStore.from_rows(fieldnames, rows), _signature_for(self.filepath, sha1), digests)
+        index.save()
+        return index
+
+    @classmethod
+    def load(cls, filepath, search_cols):
+        """Load the persisted index, None if missing or incompatible; it may be stale (see is_current)"""
+        try:
+            with open(_with_suffix(filepath, INDEX_SUFFIX), 'rb') as f:
+                data = marshal.loads(f.read())
+        except (OSError, ValueError, EOFError, TypeError):
+            return None
+        if (not isinstance(data, dict) or data.get("version") != INDEX_VERSION
+                or data.get("python") != sys.version_info[:2]
+                or data.get("search_cols") != list(search_cols) or data.get("tokenizer") != TOKENIZER_STEPS
+                or data["bm25"].get("field_weights") != _field_weights(search_cols)):
+            return None
+        columns = ColumnStore.open(_with_suffix(filepath, COLUMNS_SUFFIX), data["signature"]["sha1"])
+        if columns is None:
+            return None
+        return cls(filepath, search_cols, BM25.from_dict(data["bm25"], BM25_BACKEND),
+                   columns, data["signature"], data["digests"])
+
+    def is_current(self):
+        """Check the CSV against the recorded mtime/size, falling back to its hash"""
+        try:
+            current = _file_signature(self.filepath, with_hash=False)
+        except OSError:
+            return False
+        if current["mtime_ns"] == self.signature["mtime_ns"] and current["size"] == self.signature["size"]:
+            return True
+        if current["size"] != self.signature["size"]:
+            return False
+        # Touched but possibly unchanged (e.g. fresh checkout): compare contents
+        if _sha1(_read_bytes(self.filepath)) != self.signature["sha1"]:
+            return False
+        self.signature["mtime_ns"] = current["mtime_ns"]
+        self.save(columns=False)
+        return True
+
+    def save(self, columns=True):
+        """Write the index (and its column store) atomically"""
+        data = {
+            "version": INDEX_VERSION,
+            "python": sys.version_info[:2],
+            "search_cols": self.search_cols,
+            "tokenizer": self.bm25.tokenizer.steps,
+            "signature": self.signature,
+            "digests": self.digests,
+            "bm25": self.bm25.to_dict(),
+        }
+        if columns and not self.columns.save(self.columns_path, self.signature["sha1"]):
+            return
+        _write_atomic(self.index_path, lambda f: marshal.dump(data, f))
+
+    def vectors(self):
+        """Semantic vectors of the rows, memory-mapped from "<name>.vec" or fitted on first use.
+
+        None when NumPy is not installed.
+        """
+        if self._vectors is None:
+            path = _with_suffix(self.filepath, VECTORS_SUFFIX)
+            fingerprint = [self.signature["sha1"], self.bm25.tokenizer.steps, self.bm25.field_weights,
+                           len(self.bm25.vocab), self.bm25.N]
+            vectors = SemanticVectors.open(path, fingerprint)
+            if vectors is None:
+                vectors = SemanticVectors.fit(self.bm25)
+                if vectors is not None:
+                    vectors.save(path, fingerprint)
+            self._vectors = vectors or False
+        return self._vectors or None
+
+    def rows(self, indices, columns=None):
+        """Materialize only the requested rows (and columns) from the column store"""
+        return [self.columns.row(idx, columns) for idx in indices]
+
+
+_INDEXES = {}
+
+
+def load_index(filepath, search_cols):
+    """Return a current SearchIndex for filepath, loading or rebuilding it lazily"""
+    key = (str(filepath), tuple(search_cols))
+    index = _INDEXES.get(key) or SearchIndex.load(filepath, search_cols)
+    # A stale index is patched incrementally from the CSV diff rather than refit
+    if index is not None and not index.is_current():
+        index = index.refreshed()
+    if index is None:
+        index = SearchIndex.build(filepath, search_cols)
+        index.save()
+    _INDEXES[key] = index
+    return index
+
+
+# ============ JOIN INDEX ============
+def _key_name(value):
+    return " ".join(value.lower().split())
+
+
+def _name_trigrams(name):
+    return set().union(*(_trigrams(word) for word in re.sub(r'[^\w]+', " ", name).split()))
+
+
+class _KeyResolver:
+    """Resolves names to (target position, row id) against the key columns of several files"""
+
+    def __init__(self, targets):
+        self.keys = {}
+        for pos, (index, key_col) in enumerate(targets):
+            for idx in range(len(index.columns)):
+                self.keys.setdefault(_key_name(index.columns.value(key_col, idx)), (pos, idx))
+        self.ordered = sorted(self.keys, key=lambda key: (self.keys[key][0], len(key)))
+        self.grams = {key: _name_trigrams(key) for key in self.keys}
+
+    def exact(self, name):
+        return self.keys.get(_key_name(name))
+
+    def approximate(self, name):
+        """Shortest key that name is a word prefix of, else the most similar key by trigrams"""
+        name = _key_name(name)
+        for key in self.ordered:
+            if key.startswith(name) and not key[len(name):len(name) + 1].isalnum():
+                return self.keys[key]
+        grams = _name_trigrams(name)
+        best, best_score = None, JOIN_MIN_SIMILARITY
+        for key in self.ordered:
+            score = 2 * len(grams & self.grams[key]) / ((len(grams) + len(self.grams[key])) or 1)
+            if score > best_score:
+                best, best_score = key, score
+        return self.keys[best] if best is not None else None
+
+    def resolve(self, cell):
+        """Row references named by one cell, plus the names that matched no row"""
+        parts = [part for part in re.split(r'\s*[+,]\s*', cell.strip()) if part]
+        links, unresolved = [], []
+        start = 0
+        while start < len(parts):
+            # Longest run of parts that is itself a key, e.g. "Hero + Features + CTA"
+            for end in range(len(parts), start, -1):
+                link = self.exact(" + ".join(parts[start:end]))
+                if link is not None:
+                    break
+            else:
+                end = start + 1
+                if parts[start].lower().startswith("n/a"):  # "N/A - Dashboard focused"
+                    start = end
+                    continue
+                link = self.approximate(parts[start])
+                if link is None:
+                    unresolved.append(parts[start])
+            if link is not None and link not in links:
+                links.append(link)
+            start = end
+        return tuple(links), tuple(unresolved)
+
+
+class JoinIndex:
+    """Row-level cross-reference from one column of a data file to rows of other files.
+
+    Every cell of the source column is resolved once, against the key columns of the
+    targets in order, so following a reference is a list lookup. Names are matched
+    whole (keys may themselves contain "+"), then as "+"/"," separated parts, as a word
+    prefix of a key ("Dark Mode" -> "Dark Mode (OLED)"), and finally by trigram
+    similarity ("Real-Time Monitor" -> "Real-Time Monitoring").
+    """
+
+    def __init__(self, targets, links, unresolved):
+        self.targets = list(targets)  # target domains, in resolution order
+        self.links = links            # per source row: ((target position, row id), ...)
+        self.unresolved = unresolved  # per source row: names that matched no target row
+        self.indexes = None           # SearchIndex of each target, attached by join_index()
 
-    # Build documents from search columns
+    @classmethod
+    def build(cls, source, column, targets):
+        """Resolve column of source against targets, a list of (domain, key column, SearchIndex)"""
+        resolver = _KeyResolver([(index, key_col) for _, key_col, index in targets])
+        resolved = [resolver.resolve(source.columns.value(column, idx)) for idx in range(len(source.columns))]
+        return cls([domain for domain, _, _ in targets],
+                   [links for links, _ in resolved], [names for _, names in resolved])
+
+    def to_dict(self):
+        return {"targets": self.targets, "links": self.links, "unresolved": self.unresolved}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["targets"], data["links"], data["unresolved"])
+
+    def lookup(self, row_id):
+        """(target domain, row id) pairs referenced by one source row, in the order it names them"""
+        return [(self.targets[pos], idx) for pos, idx in self.links[row_id]]
+
+    def rows(self, row_id, limit=None):
+        """Referenced rows with their target's output columns"""
+        return [self.indexes[pos].rows([idx], CSV_CONFIG[self.targets[pos]]["output_cols"])[0]
+                for pos, idx in self.links[row_id][:limit]]
+
+
+_JOIN_INDEXES = {}
+
+
+def _load_domain(domain):
+    config = CSV_CONFIG[domain]
+    return _load_index_safe(os.path.join(DATA_DIR, config["file"]), config["search_cols"])
+
+
+def _join_indexes(domain):
+    """{column: JoinIndex} for every JOINS entry whose source is domain, None if a file is unavailable.
+
+    Built together when the source's data is first loaded and persisted next to its CSV
+    as "<name>.joins", keyed by the hashes of the source and target files.
+    """
+    columns = {column: targets for (source, column), targets in JOINS.items() if source == domain}
+    target_domains = list(dict.fromkeys(target for targets in columns.values() for target, _ in targets))
+    indexes = dict(zip([domain] + target_domains, map(_load_domain, [domain] + target_domains)))
+    if any(index is None for index in indexes.values()):
+        return None
+    version = [indexes[name].signature["sha1"] for name in [domain] + target_domains]
+
+    cached = _JOIN_INDEXES.get(domain)
+    if cached is None or cached[0] != version:
+        path = _with_suffix(indexes[domain].filepath, JOINS_SUFFIX)
+        joins = _load_joins(path, version, columns)
+        if joins is None:
+            joins = {column: JoinIndex.build(indexes[domain], column,
+                                             [(target, key_col, indexes[target]) for target, key_col in targets])
+                     for column, targets in columns.items()}
+            data = {"version": INDEX_VERSION, "python": sys.version_info[:2], "data": version,
+                    "joins": {column: join.to_dict() for column, join in joins.items()}}
+            _write_atomic(path, lambda f: marshal.dump(data, f))
+        cached = _JOIN_INDEXES[domain] = (version, joins)
+    for join in cached[1].values():
+        join.indexes = [indexes[target] for target in join.targets]
+    return cached[1]
+
+
+def _load_joins(path, version, columns):
     try:
-        documents = [" ".join(str(row.get(col, "")) for col in search_cols) for row in data]
+        with open(path, 'rb') as f:
+            data = marshal.loads(f.read())
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+    if (not isinstance(data, dict) or data.get("version") != INDEX_VERSION
+            or data.get("python") != sys.version_info[:2] or data.get("data") != version
+            or set(data.get("joins", ())) != set(columns)
+            or any(data["joins"][column]["targets"] != [t for t, _ in targets] for column, targets in columns.items())):
+        return None
+    return {column: JoinIndex.from_dict(join) for column, join in data["joins"].items()}
+
+
+def join_index(domain, column):
+    """JoinIndex for a JOINS entry, current with both data files; None if unavailable"""
+    joins = _join_indexes(domain)
+    return joins.get(column) if joins is not None else None
+
+
+def linked_rows(domain, column, row_id, limit=None):
+    """Rows that row_id of domain names in column (e.g. a product's "Secondary Styles"), in O(1)"""
+    join = join_index(domain, column)
+    return join.rows(row_id, limit) if join is not None else []
+
+
+# ============ DOMAIN ROUTER ============
+# Intent keywords per domain, matched as whole query words (multi-word entries as consecutive words)
+DOMAIN_KEYWORDS = {
+    "color": ["color", "palette", "hex", "rgb"],
+    "chart": ["chart", "graph", "visualization", "trend", "bar", "pie", "scatter", "heatmap", "funnel"],
+    "landing": ["landing", "page", "cta", "conversion", "hero", "testimonial", "pricing", "section"],
+    "product": ["saas", "ecommerce", "e-commerce", "fintech", "healthcare", "gaming", "portfolio", "crypto", "dashboard"],
+    "prompt": ["prompt", "css", "implementation", "variable", "checklist", "tailwind"],
+    "style": ["style", "design", "ui", "minimalism", "glassmorphism", "neumorphism", "brutalism", "dark mode", "flat", "aurora"],
+    "ux": ["ux", "usability", "accessibility", "wcag", "touch", "scroll", "animation", "keyboard", "navigation", "mobile"],
+    "typography": ["font", "typography", "heading", "serif", "sans"]
+}
+KEYWORD_WEIGHT = 2.0
+ROUTER_FILE = "domains.router"
+
+_WORD_RE = re.compile(r'\w+')
+_HEX_COLOR_RE = re.compile(r'#(?:[0-9a-f]{8}|[0-9a-f]{6}|[0-9a-f]{3})\b', re.IGNORECASE)
+_KEYWORD_PHRASES = defaultdict(list)
+for _domain, _keywords in DOMAIN_KEYWORDS.items():
+    for _keyword in _keywords:
+        _KEYWORD_PHRASES[tuple(_WORD_RE.findall(_keyword))].append(_domain)
+_MAX_PHRASE = max(map(len, _KEYWORD_PHRASES))
+
+
+def _keyword_hits(query):
+    """{domain: intent keyword hits} for query, every domain present; needs no index"""
+    keyword_hits = dict.fromkeys(CSV_CONFIG, 0)
+    words = [word[:-1] if word.endswith("s") and len(word) > 3 and (word[:-1],) in _KEYWORD_PHRASES else word
+             for word in _WORD_RE.findall(query.lower())]
+    for size in range(1, _MAX_PHRASE + 1):
+        for start in range(len(words) - size + 1):
+            for domain in _KEYWORD_PHRASES.get(tuple(words[start:start + size]), ()):
+                keyword_hits[domain] += 1
+    if _HEX_COLOR_RE.search(query):
+        keyword_hits["color"] += 1
+    return keyword_hits
+
+
+class DomainRouter:
+    """Token-level domain classifier over the intent keywords and every domain's vocabulary.
+
+    Query words are looked up whole, as phrases of up to _MAX_PHRASE words, in the
+    keyword table ("page" does not fire on "homepage", a hex colour like "#1e293b" does
+    on color); query tokens are looked up in a term -> domains table built from the BM25
+    vocabularies, where a term found in fewer domains counts for more. Scores are
+    normalized to sum to 1. The term table is persisted as ROUTER_FILE in DATA_DIR and
+    rebuilt when a domain's CSV changes.
+    """
+
+    def __init__(self, domains, terms, doc_freqs, doc_counts, signatures, steps):
+        self.domains = list(domains)  # CSV_CONFIG domains, in order
+        self.terms = terms            # {term: term id} over every domain's vocabulary
+        self.doc_freqs = doc_freqs    # per domain: uint32 document frequencies by term id (array, or a view of the router file)
+        self.doc_counts = doc_counts  # rows per domain
+        self.signatures = signatures  # [mtime_ns, size] per domain CSV when built
+        self.steps = list(steps)
+        self.tokenizer = get_tokenizer(self.steps)
+        self.token_mask = lru_cache(maxsize=EXPANSION_CACHE_SIZE)(self._token_mask)
+        self._term_index = None
+
+    @classmethod
+    def build(cls):
+        """Read the vocabulary of every domain's index (loading or building them concurrently)"""
+        from array import array
+
+        domains = list(CSV_CONFIG)
+        indexes = list(_executor().map(_load_domain, domains))
+        live = [index for index in indexes if index is not None]
+        terms = {term: term_id for term_id, term in enumerate(sorted(set().union(*(index.bm25.vocab for index in live))))}
+        doc_freqs = [array('I', [index.bm25.doc_freq(term) for term in terms] if index is not None else bytes(4 * len(terms)))
+                     for index in indexes]
+        signatures = [[index.signature["mtime_ns"], index.signature["size"]] if index is not None else None
+                      for index in indexes]
+        return cls(domains, terms, doc_freqs, [index.bm25.N if index is not None else 0 for index in indexes],
+                   signatures, TOKENIZER_STEPS)
+
+    @classmethod
+    def keywords_only(cls):
+        """A router with no vocabulary: classify() scores the intent keywords alone"""
+        return cls(CSV_CONFIG, {}, [], [0] * len(CSV_CONFIG), [None] * len(CSV_CONFIG), TOKENIZER_STEPS)
+
+    @classmethod
+    def load(cls):
+        """The persisted router, None if missing, incompatible or older than a domain's CSV"""
+        try:
+            with open(os.path.join(DATA_DIR, ROUTER_FILE), 'rb') as f:
+                data = marshal.loads(f.read())
+        except (OSError, ValueError, EOFError, TypeError):
+            return None
+        if (not isinstance(data, dict) or data.get("version") != INDEX_VERSION
+                or data.get("python") != sys.version_info[:2] or data.get("steps") != TOKENIZER_STEPS
+                or data.get("domains") != list(CSV_CONFIG) or data.get("byteorder") != sys.byteorder):
+            return None
+        # Terms as one newline-joined string and frequencies as raw uint32 buffers viewed in place: no per-term objects
+        terms = data["terms"].split("\n") if data["terms"] else []
+        doc_freqs = [memoryview(raw).cast('I') for raw in data["doc_freqs"]]
+        router = cls(data["domains"], dict(zip(terms, range(len(terms)))), doc_freqs, data["doc_counts"],
+                     data["signatures"], data["steps"])
+        return router if router.is_current() else None
+
+    def is_current(self):
+        for domain, signature in zip(self.domains, self.signatures):
+            try:
+                current = _file_signature(os.path.join(DATA_DIR, CSV_CONFIG[domain]["file"]), with_hash=False)
+            except OSError:
+                current = None
+            if (current and [current["mtime_ns"], current["size"]]) != signature:
+                return False
+        return True
+
+    def save(self):
+        data = {"version": INDEX_VERSION, "python": sys.version_info[:2], "steps": self.steps,
+                "domains": self.domains, "terms": "\n".join(self.terms), "byteorder": sys.byteorder,
+                "doc_freqs": [freqs.tobytes() for freqs in self.doc_freqs], "doc_counts": self.doc_counts,
+                "signatures": self.signatures}
+        _write_atomic(os.path.join(DATA_DIR, ROUTER_FILE), lambda f: marshal.dump(data, f))
+
+    def classify(self, query):
+        """Calibrated {domain: score}, best first; ties go to more keyword hits, then more covered tokens"""
+        raw = dict.fromkeys(self.domains, 0.0)
+        keyword_hits = _keyword_hits(query)
+
+        # Each indexed token is one unit of evidence, split by how often its domains' rows contain it
+        covered = dict.fromkeys(self.domains, 0)
+        for token in set(self.tokenizer.tokenize_query(query)):
+            rates = self._rates(token)
+            total_rate = sum(rate for _, rate in rates)
+            for pos, rate in rates:
+                raw[self.domains[pos]] += rate / total_rate
+                covered[self.domains[pos]] += 1
+
+        for domain in raw:
+            raw[domain] += KEYWORD_WEIGHT * keyword_hits.get(domain, 0)
+        total = sum(raw.values())
+        if not total:
+            return {}
+        ranked = sorted((domain for domain in self.domains if raw[domain]),
+                        key=lambda d: (-raw[d], -keyword_hits[d], -covered[d]))
+        return {domain: raw[domain] / total for domain in ranked}
+
+    def _token_mask(self, token):
+        """Domains where token is indexed or, with fuzzy matching, can expand to an indexed term"""
+        terms = [token]
+        if FUZZY_MATCHING and len(token) >= FUZZY_MIN_LENGTH:
+            if self._term_index is None:
+                self._term_index = _term_index(self.terms)
+            terms += _fuzzy_candidates(token, *self._term_index)
+        mask = 0
+        for term in terms:
+            for pos, _ in self._rates(term):
+                mask |= 1 << pos
+        return mask
+
+    def _rates(self, term):
+        """(domain position, share of that domain's rows containing term) for every domain indexing it"""
+        term_id = self.terms.get(term)
+        if term_id is None:
+            return []
+        return [(pos, freqs[term_id] / self.doc_counts[pos])
+                for pos, freqs in enumerate(self.doc_freqs) if freqs[term_id]]
+
+    def possible_domains(self, query_tokens):
+        """Domains in which at least one query token can score, so federated search may skip the rest"""
+        mask = 0
+        for token in set(query_tokens):
+            mask |= self.token_mask(token)
+        return [domain for pos, domain in enumerate(self.domains) if mask >> pos & 1]
+
+
+_ROUTER = None
+
+
+def domain_router(required=True):
+    """The DomainRouter, loaded from disk or rebuilt whenever a domain's CSV has changed.
+
+    A rebuild loads every domain's index. With required=False, None is returned instead
+    when the rebuilt router could not be saved (a read-only DATA_DIR), so one-shot callers
+    don't repeat that cost on every run.
+    """
+    global _ROUTER
+    if _ROUTER is None or not _ROUTER.is_current():
+        router = DomainRouter.load()
+        if router is None:
+            if not required and not os.access(DATA_DIR, os.W_OK):
+                return None
+            router = DomainRouter.build()
+            router.save()
+        _ROUTER = router
+    return _ROUTER
+
+
+# ============ SEMANTIC RERANKER ============
+class SemanticVectors:
+    """LSA embedding of an index: float32 term and row vectors, memory-mapped from "<name>.vec".
+
+    Rows are the BM25 postings as L2-normalized tf-idf vectors, projected onto their top
+    (up to LSA_DIMENSIONS) singular vectors (randomized SVD with a fixed seed, so builds are
+    deterministic). Queries are folded in through the term vectors, so words that share
+    context in the data (e.g. "calm" and "serene") land close together.
+    """
+
+    MAGIC = b"UIPVEC01"
+
+    def __init__(self, np, terms, rows, mapped=None):
+        self._np = np
+        self.terms = terms    # (n_terms, dims): query fold-in
+        self.rows = rows      # (n_rows, dims), unit length
+        self._mmap = mapped
+
+    @classmethod
+    def fit(cls, bm25):
+        """Embed bm25's documents; None without NumPy or documents"""
+        np, sparse = _import_numpy()
+        if np is None or bm25.N == 0 or not bm25.vocab:
+            return None
+        doc_ids, term_ids, weights = [], [], []
+        for term_id, plist in enumerate(bm25.postings):
+            for idx, tf in plist:
+                doc_ids.append(idx)
+                term_ids.append(term_id)
+                weights.append(tf * bm25.idf[term_id])
+        weights = np.array(weights, dtype=np.float64)
+        norms = np.zeros(bm25.N)
+        np.add.at(norms, doc_ids, weights ** 2)
+        weights /= np.sqrt(norms)[doc_ids]
+        shape = (bm25.N, len(bm25.postings))
+        if sparse is not None:
+            matrix = sparse.csr_matrix((weights, (doc_ids, term_ids)), shape=shape)
+        else:
+            matrix = np.zeros(shape)
+            matrix[doc_ids, term_ids] = weights
+
+        # Randomized SVD (Halko et al.) with one power iteration
+        # About one dimension per four rows: enough to separate topics, few enough to generalize
+        dims = min(LSA_DIMENSIONS, max(2, shape[0] // 4), shape[1])
+        sketch = min(dims + 10, *shape)
+        omega = np.random.default_rng(0).standard_normal((shape[1], sketch))
+        basis = np.linalg.qr(matrix @ (matrix.T @ (matrix @ omega)))[0]
+        u, sigma, vt = np.linalg.svd(np.asarray((matrix.T @ basis).T), full_matrices=False)
+        rows = (basis @ u[:, :dims]) * sigma[:dims]
+        lengths = np.linalg.norm(rows, axis=1, keepdims=True)
+        rows = rows / np.where(lengths > 0, lengths, 1)
+        return cls(np, vt[:dims].T.astype(np.float32), rows.astype(np.float32))
+
+    def save(self, path, fingerprint):
+        """Write the vectors; returns False if the file could not be written"""
+        header = marshal.dumps({"fingerprint": fingerprint, "byteorder": sys.byteorder,
+                                "terms": self.terms.shape, "rows": self.rows.shape})
+        padding = -(len(self.MAGIC) + 4 + len(header)) % 8  # keep the float arrays aligned
+
+        def write(f):
+            f.write(self.MAGIC + len(header).to_bytes(4, 'little') + header + b"\0" * padding)
+            f.write(self._np.ascontiguousarray(self.terms).tobytes())
+            f.write(self._np.ascontiguousarray(self.rows).tobytes())
+        return _write_atomic(path, write)
+
+    @classmethod
+    def open(cls, path, fingerprint):
+        """Memory-map saved vectors; None if missing, built for another index, or no NumPy"""
+        np = _import_numpy()[0]
+        if np is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            if mapped[:len(cls.MAGIC)] != cls.MAGIC:
+                raise ValueError("bad magic")
+            start = len(cls.MAGIC) + 4
+            header_len = int.from_bytes(mapped[len(cls.MAGIC):start], 'little')
+            header = marshal.loads(mapped[start:start + header_len])
+            if header["fingerprint"] != fingerprint or header["byteorder"] != sys.byteorder:
+                raise ValueError("stale vectors")
+            offset = start + header_len + (-(start + header_len) % 8)
+            arrays = []
+            for shape in (header["terms"], header["rows"]):
+                count = shape[0] * shape[1]
+                arrays.append(np.frombuffer(mapped, dtype=np.float32, count=count, offset=offset).reshape(shape))
+                offset += count * 4
+        except (ValueError, KeyError, EOFError, TypeError):
+            mapped.close()
+            return None
+        return cls(np, *arrays, mapped=mapped)
+
+    def query_vector(self, bm25, query):
+        """Unit-length query embedding from its (fuzzy-expanded) terms; None if it has none"""
+        np = self._np
+        terms = bm25._query_terms(query, None)
+        if not terms:
+            return None
+        vector = np.zeros(self.terms.shape[1], dtype=np.float32)
+        for term_id, weight in terms:
+            vector += weight * self.terms[term_id]
+        length = np.linalg.norm(vector)
+        return vector / length if length > 0 else None
+
+    def rerank(self, bm25, query, ranked, top_k):
+        """Reorder BM25 (doc, score) pairs, plus the nearest rows, by blended BM25 and cosine score"""
+        np = self._np
+        vector = self.query_vector(bm25, query)
+        if vector is None:
+            return ranked[:top_k]
+        cosine = self.rows @ vector
+        nearest = np.argpartition(-cosine, min(RERANK_DEPTH, len(cosine)) - 1)[:RERANK_DEPTH]
+        best = max((score for _, score in ranked), default=0) or 1
+        lexical = {idx: score / best for idx, score in ranked}
+        candidates = set(lexical).union(int(idx) for idx in nearest if cosine[idx] >= RERANK_MIN_SIMILARITY)
+        blended = [(idx, (1 - RERANK_WEIGHT) * lexical.get(idx, 0.0) + RERANK_WEIGHT * max(float(cosine[idx]), 0.0))
+                   for idx in candidates]
+        return heapq.nlargest(top_k, blended, key=lambda item: (item[1], -item[0]))
+
+
+# ============ RESULT CACHE ============
+class ResultCache:
+    """Size-bounded LRU cache of search results, optionally mirrored to a directory"""
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, directory=None):
+        self.maxsize = maxsize
+        self.directory = str(directory) if directory else None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, _sha1(repr(key).encode('utf-8')) + ".json")
+
+    def get(self, key):
+        """Return the cached value or None, updating LRU order and hit/miss counters"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, value)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+        self._disk_put(key, value)
+
+    def _store(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, key):
+        if self.directory is None:
+            return None
+        import json
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            os.utime(path)  # mtime doubles as the on-disk LRU clock
+        except (OSError, ValueError):
+            return None
+        return data.get("value") if data.get("key") == repr(key) else None
+
+    def _disk_put(self, key, value):
+        if self.directory is None:
+            return
+        import json
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            data = json.dumps({"key": repr(key), "value": value}, ensure_ascii=False).encode('utf-8')
+            if not _write_atomic(self._disk_path(key), lambda f: f.write(data)):
+                return
+            entries = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+                             key=lambda entry: entry.stat().st_mtime_ns)
+            for stale in entries[:max(0, len(entries) - self.maxsize)]:
+                os.unlink(stale.path)
+        except OSError:
+            pass
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+RESULT_CACHE = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_DIR)
+
+
+def _cache_key(kind, indexes, query_tokens, max_results):
+    """Key on normalized query tokens, every setting that changes rankings and the content hash of every source CSV.
+
+    The disk cache can be shared between processes with different settings, so each one must be in the key.
+    """
+    return (kind, tuple(sorted(query_tokens)), max_results, FUZZY_MATCHING, RERANK, RANKING, tuple(TOKENIZER_STEPS),
+            tuple((str(index.filepath), index.signature["sha1"], tuple(index.bm25.field_weights or ()))
+                  for index in indexes))
+
+
+def _cache_info(hit):
+    return {"hit": hit, **RESULT_CACHE.stats()}
+
+
+# ============ SEARCH FUNCTIONS ============
+def _load_index_safe(filepath, search_cols):
+    """load_index() that reports read errors as warnings and returns None"""
+    if not os.path.exists(filepath):
+        return None
+    try:
+        return load_index(filepath, search_cols)
     except Exception as e:
-        print(f"Warning: Error building documents: {e}", file=sys.stderr)
-        return []
+        csv = sys.modules.get("csv")  # only imported once a CSV has been parsed, i.e. before any csv.Error
+        expected = isinstance(e, UnicodeDecodeError) or (csv is not None and isinstance(e, csv.Error))
+        print(f"Warning: {'Error' if expected else 'Unexpected error'} reading {filepath}: {e}", file=sys.stderr)
+    return None
 
-    # BM25 search
-    bm25 = BM25()
-    bm25.fit(documents)
 
-    if bm25.N == 0:
+def _output_rows(index, winners, output_cols):
+    """Materialize the output columns of the winning rows only"""
+    try:
+        return index.rows(winners, output_cols)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Error reading {index.filepath}: {e}", file=sys.stderr)
         return []
 
-    ranked = bm25.score(query)
+
+def _search_csv(filepath, search_cols, output_cols, query, max_results):
+    """Core search function using BM25 with comprehensive error handling.
+
+    Returns (results, cache_hit).
+    """
+    index = _load_index_safe(filepath, search_cols)
+    if index is None or index.bm25.N == 0:
+        return [], False
+
+    key = _cache_key(tuple(output_cols), [index], index.bm25.tokenizer.tokenize_query(query), max_results)
+    cached = RESULT_CACHE.get(key)
+    if cached is not None:
+        return [dict(row) for row in cached], True
+
+    if RERANK:
+        ranked = index.bm25.score(query, top_k=max(RERANK_DEPTH, max_results))
+        vectors = index.vectors()
+        ranked = vectors.rerank(index.bm25, query, ranked, max_results) if vectors else ranked[:max_results]
+    else:
+        ranked = index.bm25.score(query, top_k=max_results)
 
     # Get top results with score > 0
-    results = []
-    for idx, score in ranked[:max_results]:
-        if score > 0 and idx < len(data):
-            row = data[idx]
-            results.append({col: row.get(col, "") for col in output_cols if col in row})
+    winners = [idx for idx, score in ranked if score > 0]
+    results = _output_rows(index, winners, output_cols)
+    RESULT_CACHE.put(key, results)
+    return [dict(row) for row in results], False
 
-    return results
 
+def _shared_idf(indexes, query_tokens, skipped_docs=0):
+    """IDF of the query tokens (and their fuzzy expansions) over the union of several indexes' documents.
 
-def detect_domain(query):
-    """Auto-detect the most relevant domain from query"""
-    query_lower = query.lower()
-
-    domain_keywords = {
-        "color": ["color", "palette", "hex", "#", "rgb"],
-        "chart": ["chart", "graph", "visualization", "trend", "bar", "pie", "scatter", "heatmap", "funnel"],
-        "landing": ["landing", "page", "cta", "conversion", "hero", "testimonial", "pricing", "section"],
-        "product": ["saas", "ecommerce", "e-commerce", "fintech", "healthcare", "gaming", "portfolio", "crypto", "dashboard"],
-        "prompt": ["prompt", "css", "implementation", "variable", "checklist", "tailwind"],
-        "style": ["style", "design", "ui", "minimalism", "glassmorphism", "neumorphism", "brutalism", "dark mode", "flat", "aurora"],
-        "ux": ["ux", "usability", "accessibility", "wcag", "touch", "scroll", "animation", "keyboard", "navigation", "mobile"],
-        "typography": ["font", "typography", "heading", "serif", "sans"]
+    skipped_docs counts rows of files left out because no query token can match them.
+    """
+    total_docs = sum(index.bm25.N for index in indexes) + skipped_docs
+    terms = {term for token in set(query_tokens) for index in indexes for term, _, _ in index.bm25.match_term(token)}
+    idf = {}
+    for term in terms:
+        freq = sum(index.bm25.doc_freq(term) for index in indexes)
+        if freq:
+            idf[term] = log((total_docs - freq + 0.5) / (freq + 0.5) + 1)
+    return idf
+
+
+_EXECUTOR = None
+
+
+def _executor():
+    """Shared worker pool for concurrent index loading and scoring"""
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _EXECUTOR = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4))
+    return _EXECUTOR
+
+
+def _federated_targets(include_stacks):
+    """(label, file, search_cols, output_cols) for every domain, optionally every stack"""
+    targets = [(domain, config["file"], config["search_cols"], config["output_cols"])
+               for domain, config in CSV_CONFIG.items()]
+    if include_stacks:
+        targets += [(f"stack:{stack}", config["file"], _STACK_COLS["search_cols"], _STACK_COLS["output_cols"])
+                    for stack, config in STACK_CONFIG.items()]
+    return targets
+
+
+def _score_federated(live, query, query_tokens, max_results, limit, skipped_docs=0):
+    """Score (target, index) pairs concurrently with shared IDF; best `limit` (pos, idx) overall"""
+    idf = _shared_idf([index for _, index in live], query_tokens, skipped_docs)
+    ranked = list(_executor().map(lambda item: item[1].bm25.score(query, top_k=max_results, idf=idf), live))
+    candidates = [(score, -pos, -idx, pos, idx)
+                  for pos, scored in enumerate(ranked) for idx, score in scored if score > 0]
+    return [(pos, idx) for _, _, _, pos, idx in heapq.nlargest(limit, candidates)]
+
+
+def search_all(query, max_results=MAX_RESULTS, include_stacks=False):
+    """Federated search: rank every domain (optionally every stack) in one merged top-k.
+
+    All cached indexes are scored concurrently against IDF statistics shared across
+    the files, so scores from different domains are directly comparable. Domains the
+    router rules out (no query token or fuzzy expansion in their vocabulary) are not
+    loaded at all; their row counts still enter the shared IDF.
+    """
+    router = domain_router(required=False)
+    query_tokens = get_tokenizer().tokenize_query(query)
+    # Without a router every domain is searched, which ranks the same, just without skipping any
+    possible = router.possible_domains(query_tokens) if router is not None else list(CSV_CONFIG)
+    skipped_docs = sum(count for domain, count in zip(router.domains, router.doc_counts)
+                       if domain not in possible) if router is not None else 0
+    targets = [target for target in _federated_targets(include_stacks)
+               if target[0] not in CSV_CONFIG or target[0] in possible]
+    pool = _executor()
+    indexes = list(pool.map(lambda t: _load_index_safe(os.path.join(DATA_DIR, t[1]), t[2]), targets))
+    live = [(target, index) for target, index in zip(targets, indexes) if index is not None and index.bm25.N]
+
+    key = _cache_key((ALL_DOMAINS, include_stacks, skipped_docs), [index for _, index in live], query_tokens, max_results)
+    cached = RESULT_CACHE.get(key)
+    if cached is not None:
+        return {"domain": ALL_DOMAINS, "query": query, **cached,
+                "results": [dict(row) for row in cached["results"]], "cache": _cache_info(True)}
+
+    winners = _score_federated(live, query, query_tokens, max_results, max_results, skipped_docs)
+
+    results, files = [], []
+    for pos, idx in winners:
+        (label, file, _, output_cols), index = live[pos]
+        for row in _output_rows(index, [idx], output_cols):
+            results.append({"Domain": label, **row})
+            if file not in files:
+                files.append(file)
+
+    RESULT_CACHE.put(key, {"file": ", ".join(files), "count": len(results), "results": results})
+    return {
+        "domain": ALL_DOMAINS,
+        "query": query,
+        "file": ", ".join(files),
+        "count": len(results),
+        "results": [dict(row) for row in results],
+        "cache": _cache_info(False)
     }
 
-    scores = {domain: sum(1 for kw in keywords if kw in query_lower) for domain, keywords in domain_keywords.items()}
-    best = max(scores, key=scores.get)
-    return best if scores[best] > 0 else "style"
+
+def classify_domains(query):
+    """Calibrated {domain: score} for a query (scores sum to 1, best first); {} without evidence.
+
+    Intent keywords alone are scored when the router is unavailable (see domain_router).
+    """
+    router = domain_router(required=False)
+    return (router or DomainRouter.keywords_only()).classify(query)
+
+
+def detect_domain(query):
+    """Auto-detect the most relevant domain from query ("style" when nothing points anywhere).
+
+    Each query token adds at most one unit of vocabulary evidence, so a keyword lead worth
+    more than the token count decides the domain without loading the router.
+    """
+    (best, top), (_, second) = heapq.nlargest(2, _keyword_hits(query).items(), key=lambda item: item[1])
+    if KEYWORD_WEIGHT * (top - second) > len(set(get_tokenizer().tokenize_query(query))):
+        return best
+    return next(iter(classify_domains(query)), "style")
 
 
 def search(query, domain=None, max_results=MAX_RESULTS):
-    """Main search function with auto-domain detection"""
+    """Main search function with auto-domain detection ("all" searches every domain)"""
     if domain is None:
         domain = detect_domain(query)
+    if domain == ALL_DOMAINS:
+        return search_all(query, max_results)
 
     config = CSV_CONFIG.get(domain, CSV_CONFIG["style"])
-    filepath = DATA_DIR / config["file"]
+    filepath = os.path.join(DATA_DIR, config["file"])
 
-    if not filepath.exists():
+    if not os.path.exists(filepath):
         return {"error": f"File not found: {filepath}", "domain": domain}
 
-    results = _search_csv(filepath, config["search_cols"], config["output_cols"], query, max_results)
+    results, hit = _search_csv(filepath, config["search_cols"], config["output_cols"], query, max_results)
 
     return {
         "domain": domain,
         "query": query,
         "file": config["file"],
         "count": len(results),
-        "results": results
+        "results": results,
+        "cache": _cache_info(hit)
+    }
+
+
+def _parse_stacks(stack):
+    """Stack names from "react", "react,nextjs" or "all"; raises ValueError on unknown names"""
+    if stack == ALL_STACKS:
+        return list(AVAILABLE_STACKS)
+    stacks = list(dict.fromkeys(name.strip() for name in stack.split(",") if name.strip()))
+    unknown = [name for name in stacks if name not in STACK_CONFIG]
+    if unknown or not stacks:
+        raise ValueError(f"Unknown stack: {', '.join(unknown) or stack}. Available: {', '.join(AVAILABLE_STACKS)}")
+    return stacks
+
+
+def _guideline_key(row):
+    return " ".join(row.get("Guideline", "").lower().split())
+
+
+def search_stacks(query, stacks, max_results=MAX_RESULTS):
+    """Search several stacks at once, merging their guidelines into one ranked list.
+
+    Indexes are loaded and scored concurrently with IDF shared across the stack files;
+    a guideline present in several stacks is returned once, with every stack listed.
+    """
+    pool = _executor()
+    indexes = list(pool.map(lambda name: _load_index_safe(os.path.join(DATA_DIR, STACK_CONFIG[name]["file"]), _STACK_COLS["search_cols"]), stacks))
+    live = [(name, index) for name, index in zip(stacks, indexes) if index is not None and index.bm25.N]
+    query_tokens = live[0][1].bm25.tokenizer.tokenize_query(query) if live else ()
+    label = ",".join(stacks)
+
+    key = _cache_key(("stacks", label), [index for _, index in live], query_tokens, max_results)
+    cached = RESULT_CACHE.get(key)
+    hit = cached is not None
+    if not hit:
+        results, groups, files = [], {}, []
+        for pos, idx in _score_federated(live, query, query_tokens, max_results, max_results * len(live)):
+            name, index = live[pos]
+            for row in _output_rows(index, [idx], _STACK_COLS["output_cols"]):
+                group = groups.get(_guideline_key(row))
+                if group is not None:
+                    if name not in group["Stack"].split(", "):
+                        group["Stack"] += f", {name}"
+                    continue
+                if len(results) == max_results:
+                    continue
+                group = groups[_guideline_key(row)] = {"Stack": name, **row}
+                results.append(group)
+        for row in results:
+            for name in row["Stack"].split(", "):
+                if STACK_CONFIG[name]["file"] not in files:
+                    files.append(STACK_CONFIG[name]["file"])
+        cached = {"file": ", ".join(files), "count": len(results), "results": results}
+        RESULT_CACHE.put(key, cached)
+
+    return {
+        "domain": "stack",
+        "stack": label,
+        "query": query,
+        **cached,
+        "results": [dict(row) for row in cached["results"]],
+        "cache": _cache_info(hit)
     }
 
 
 def search_stack(query, stack, max_results=MAX_RESULTS):
-    """Search stack-specific guidelines"""
+    """Search stack-specific guidelines ("react,nextjs" or "all" searches several stacks)"""
+    if stack == ALL_STACKS or "," in stack:
+        try:
+            return search_stacks(query, _parse_stacks(stack), max_results)
+        except ValueError as e:
+            return {"error": str(e)}
     if stack not in STACK_CONFIG:
         return {"error": f"Unknown stack: {stack}. Available: {', '.join(AVAILABLE_STACKS)}"}
 
-    filepath = DATA_DIR / STACK_CONFIG[stack]["file"]
+    filepath = os.path.join(DATA_DIR, STACK_CONFIG[stack]["file"])
 
-    if not filepath.exists():
+    if not os.path.exists(filepath):
         return {"error": f"Stack file not found: {filepath}", "stack": stack}
 
-    results = _search_csv(filepath, _STACK_COLS["search_cols"], _STACK_COLS["output_cols"], query, max_results)
+    results, hit = _search_csv(filepath, _STACK_COLS["search_cols"], _STACK_COLS["output_cols"], query, max_results)
 
     return {
         "domain": "stack",
@@ -252,5 +1828,142 @@ def search_stack(query, stack, max_results=MAX_RESULTS):
         "query": query,
         "file": STACK_CONFIG[stack]["file"],
         "count": len(results),
-        "results": results
+        "results": results,
+        "cache": _cache_info(hit)
     }
+
+
+def _follow(joins, product_id, columns, fallback_query, max_results):
+    """Rows a product's reference columns point to, else the fallback query's best rows; (rows, files)"""
+    target_domain = JOINS[("product", columns[0])][0][0]
+    rows, files, seen = [], [], set()
+    for column in columns if joins is not None and product_id is not None else ():
+        join = joins[column]
+        for pos, idx in join.links[product_id]:
+            if len(rows) < max_results and (join.targets[pos], idx) not in seen:
+                seen.add((join.targets[pos], idx))
+                rows += join.indexes[pos].rows([idx], CSV_CONFIG[join.targets[pos]]["output_cols"])
+                files.append(CSV_CONFIG[join.targets[pos]]["file"])
+        # Names that resolve to no row are searched for instead
+        for name in join.unresolved[product_id][:max_results - len(rows)]:
+            found = search(name, target_domain, 1)
+            rows += found.get("results", [])
+            files.append(found.get("file"))
+    if not rows:
+        found = search(fallback_query, target_domain, max_results)
+        rows, files = found.get("results", []), [found.get("file")]
+    return rows, ", ".join(dict.fromkeys(filter(None, files)))
+
+
+def generate(query, stack=None, max_results=MAX_RESULTS):
+    """Design system for a product description, assembled from the cross-referenced data files.
+
+    The best-matching product row is followed through its join indexes to its recommended styles,
+    colour palette and landing page pattern; typography and stack guidelines are ranked
+    by BM25. Every lookup after the product match runs concurrently, and the sections
+    come back as one result whose rows carry a "Section" field.
+    """
+    if stack is not None:
+        try:
+            stack = ",".join(_parse_stacks(stack)) if stack != ALL_STACKS else stack
+        except ValueError as e:
+            return {"error": str(e)}
+
+    config = CSV_CONFIG["product"]
+    index = _load_index_safe(os.path.join(DATA_DIR, config["file"]), config["search_cols"])
+    ranked = index.bm25.score(query, top_k=1) if index is not None else []
+    product_id = ranked[0][0] if ranked and ranked[0][1] > 0 else None
+    # The row can still come back empty (unreadable or filtered), so fall back to no product
+    product_rows = _output_rows(index, [product_id], config["output_cols"]) if product_id is not None else []
+    product = product_rows[0] if product_rows else {}
+
+    joins = _join_indexes("product") if product_id is not None else None
+    style_name = product.get("Primary Style Recommendation", "")
+    lookups = {
+        "Style": lambda: _follow(joins, product_id, ["Primary Style Recommendation", "Secondary Styles"], query, max_results),
+        "Colors": lambda: _follow(joins, product_id, ["Product Type"], query, max_results),
+        "Typography": lambda: _search_section(search(f"{query} {style_name}", "typography", max_results)),
+        "Landing Page": lambda: _follow(joins, product_id, ["Landing Page Pattern"], query, max_results),
+    }
+    if stack is not None:
+        lookups["Stack"] = lambda: _search_section(search_stack(f"{query} {style_name}", stack, max_results))
+    pool = _executor()
+    futures = {section: pool.submit(lookup) for section, lookup in lookups.items()}
+
+    sections = {"Product": ([product], config["file"]) if product else ([], None)}
+    sections.update((section, future.result()) for section, future in futures.items())
+    results, files = [], []
+    for section in DESIGN_SECTIONS:
+        rows, file = sections.get(section, ([], None))
+        results += [{"Section": section, **row} for row in rows]
+        for name in (file or "").split(", ") if rows else ():
+            if name not in files:
+                files.append(name)
+
+    result = {"domain": DESIGN_SYSTEM, "query": query}
+    if stack is not None:
+        result["stack"] = stack
+    return {**result, "file": ", ".join(files), "count": len(results), "results": results}
+
+
+def _search_section(result):
+    return result.get("results", []), result.get("file")
+
+
+def _run_request(request, domain=None, max_results=MAX_RESULTS):
+    """Run one batch entry: a query string or {"query", "domain"/"stack", "max_results", "generate"}.
+
+    An entry that is already an {"error": ...} (a line read_batch could not parse) is answered with it.
+    """
+    if isinstance(request, str):
+        request = {"query": request}
+    if not isinstance(request, dict):
+        return {"error": "Request must be a query string or JSON object"}
+    if "error" in request:
+        return {"error": request["error"]}
+
+    query = request.get("query")
+    if not isinstance(query, str) or not query:
+        return {"error": "Missing 'query'"}
+    try:
+        max_results = int(request.get("max_results", max_results))
+    except (TypeError, ValueError):
+        return {"error": "'max_results' must be an integer"}
+
+    if request.get("generate"):
+        return generate(query, request.get("stack"), max_results)
+    if request.get("stack"):
+        return search_stack(query, request["stack"], max_results)
+    domain = request.get("domain") or domain
+    if domain == ALL_DOMAINS and request.get("include_stacks"):
+        return search_all(query, max_results, include_stacks=True)
+    return search(query, domain, max_results)
+
+
+def _copy_result(result):
+    """A copy of a result dict sharing no rows or nested dicts with it, so callers may modify either"""
+    return {key: [dict(row) for row in value] if key == "results" else dict(value) if isinstance(value, dict) else value
+            for key, value in result.items()}
+
+
+def search_many(queries, domain=None, max_results=MAX_RESULTS):
+    """Run several queries in one process, yielding each result as soon as it is ranked.
+
+    Each data file's index is loaded once and shared by every query in the batch;
+    repeated entries are answered with copies of the batch's own results.
+    """
+    import json
+
+    answered = {}
+    for request in queries:
+        try:
+            key = json.dumps(request, sort_keys=True)
+        except (TypeError, ValueError):
+            key = None
+        if key is not None and key in answered:
+            yield _copy_result(answered[key])
+            continue
+        result = _run_request(request, domain, max_results)
+        if key is not None:
+            answered[key] = result
+        yield result
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+UI/UX Pro Max Server - keeps every BM25 index warm and answers JSON-lines queries
+
+Usage: python search.py --serve [--socket <path>]   # Unix socket daemon
+       python search.py --stdio                     # JSON-lines over stdin/stdout
+
+Request:  {"query": "...", "domain": "style"} or {"query": "...", "stack": "react", "max_results": 5}
+Response: the same dict search() / search_stack() return, one JSON object per line
+
+A request may carry "settings" (see search_settings()); a daemon started with different
+ranking settings answers {"error": ..., "settings": ...} instead, and the client searches in-process.
+"""
+
+import os
+import sys
+
+# The client half of this module runs on every search.py invocation, so core,
+# json, socket and socketserver are only imported by the functions that need them.
+
+SOCKET_ENV = "UI_PRO_MAX_SOCKET"
+CONNECT_TIMEOUT = 0.5
+REQUEST_TIMEOUT = 10.0  # a daemon that takes longer is treated as stuck; search runs in-process instead
+# Environment variables core reads once at import that change rankings
+SETTINGS_ENV = ("UI_PRO_MAX_TOKENIZER", "UI_PRO_MAX_BACKEND", "UI_PRO_MAX_FUZZY", "UI_PRO_MAX_RERANK",
+                "UI_PRO_MAX_RANKING", "UI_PRO_MAX_FIELD_WEIGHTS")
+
+
+def _uid():
+    return os.getuid() if hasattr(os, "getuid") else os.getpid()
+
+
+def default_socket_path():
+    """Socket path from $UI_PRO_MAX_SOCKET, else $XDG_RUNTIME_DIR, else a 0700 per-user directory in $TMPDIR (or /tmp)"""
+    if os.environ.get(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "ui-ux-pro-max.sock")
+    return os.path.join(_private_dir(), "server.sock")
+
+
+def _private_dir():
+    temp_dir = os.environ.get("TMPDIR") or "/tmp"
+    return os.path.join(temp_dir, f"ui-ux-pro-max-{_uid()}")
+
+
+def _owned_by_user(path):
+    """True if path exists and belongs to the current user (another local user may have created it first)"""
+    try:
+        return os.stat(path).st_uid == _uid()
+    except OSError:
+        return False
+
+
+def _prepare_socket_dir(path):
+    """Create the default per-user socket directory as 0700, refusing one another user created first"""
+    directory = os.path.dirname(os.path.abspath(path))
+    if directory != os.path.abspath(_private_dir()):
+        return
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not _owned_by_user(directory):
+        sys.exit(f"Error: {directory} is owned by another user; set ${SOCKET_ENV} to a private path")
+    os.chmod(directory, 0o700)
+
+
+def warm_indexes():
+    """Load (or build) the index of every domain and stack file, the cross-reference joins and the domain router"""
+    from core import CSV_CONFIG, STACK_CONFIG, JOINS, _STACK_COLS, DATA_DIR, load_index, join_index, domain_router
+
+    for config in CSV_CONFIG.values():
+        filepath = os.path.join(DATA_DIR, config["file"])
+        if os.path.exists(filepath):
+            load_index(filepath, config["search_cols"])
+    for config in STACK_CONFIG.values():
+        filepath = os.path.join(DATA_DIR, config["file"])
+        if os.path.exists(filepath):
+            load_index(filepath, _STACK_COLS["search_cols"])
+    for domain, column in JOINS:
+        join_index(domain, column)
+    domain_router()
+
+
+def search_settings():
+    """This process's ranking settings, as the raw environment values core was configured from"""
+    return {name: os.environ.get(name, "") for name in SETTINGS_ENV}
+
+
+def handle_request(request):
+    """Answer one decoded request with the search()/search_stack() result schema"""
+    if not isinstance(request, dict):
+        return {"error": "Request must be a JSON object"}
+    command = request.get("command")
+    if command == "ping":
+        return {"ok": True, "pid": os.getpid(), "settings": search_settings()}
+    if command is not None:
+        return {"error": f"Unknown command: {command}"}
+    settings = request.get("settings")
+    if settings is not None and settings != search_settings():
+        return {"error": "Server was started with different ranking settings", "settings": search_settings()}
+    from core import _run_request
+    return _run_request(request)
+
+
+def _answer(request):
+    """handle_request() that reports a failing search as an error response, so one bad request can't end the server"""
+    try:
+        return handle_request(request)
+    except Exception as e:
+        print(f"Warning: Error answering {request!r}: {e!r}", file=sys.stderr)
+        return {"error": f"Internal error: {e}"}
+
+
+def _decode(line):
+    """Decode one request line (bytes or str), returning (request, error_response)"""
+    import json
+    try:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        return json.loads(line), None
+    except UnicodeDecodeError as e:
+        return None, {"error": f"Invalid UTF-8: {e}"}
+    except ValueError as e:
+        return None, {"error": f"Invalid JSON: {e}"}
+
+
+def _encode(response):
+    import json
+    return json.dumps(response, ensure_ascii=False, default=str) + "\n"
+
+
+def serve_socket(path=None):
+    """Run the daemon on a Unix socket until it receives a shutdown command"""
+    import socketserver
+    import threading
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                request, response = _decode(line)
+                if isinstance(request, dict) and request.get("command") == "shutdown":
+                    self.wfile.write(_encode({"ok": True}).encode("utf-8"))
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    return
+                if response is None:
+                    response = _answer(request)
+                self.wfile.write(_encode(response).encode("utf-8"))
+                self.wfile.flush()
+
+    if not hasattr(socketserver, "ThreadingUnixStreamServer"):
+        sys.exit("Error: Unix sockets are not available on this platform; use --stdio")
+    path = path or default_socket_path()
+    _prepare_socket_dir(path)
+    if os.path.lexists(path):
+        if ping(path):
+            sys.exit(f"Error: A server is already listening on {path}")
+        if not _owned_by_user(path):
+            sys.exit(f"Error: {path} is owned by another user; set ${SOCKET_ENV} to a private path")
+        os.unlink(path)  # stale socket from a crashed daemon
+
+    warm_indexes()
+    # Create the socket as 0600 from the start instead of tightening it after bind()
+    previous_umask = os.umask(0o177)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    finally:
+        os.umask(previous_umask)
+    server.daemon_threads = True
+    try:
+        print(f"UI Pro Max server listening on {path}", file=sys.stderr)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def serve_stdio():
+    """Answer JSON-lines requests from stdin on stdout until EOF"""
+    warm_indexes()
+    for line in sys.stdin.buffer:  # bytes, so an invalid UTF-8 line is answered instead of ending the loop
+        if not line.strip():
+            continue
+        request, response = _decode(line)
+        if response is None:
+            response = _answer(request)
+        sys.stdout.write(_encode(response))
+        sys.stdout.flush()
+
+
+# ============ CLIENT ============
+def query_daemon(request, path=None):
+    """Send one request to a running daemon; None if no daemon is reachable, answers in time or the socket isn't ours"""
+    path = path or default_socket_path()
+    if not _owned_by_user(path):
+        return None
+    import json
+    import socket
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(path)
+            sock.settimeout(REQUEST_TIMEOUT)
+            sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+    except OSError:
+        return None
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def ping(path=None):
+    """Return True if a daemon answers on path"""
+    response = query_daemon({"command": "ping"}, path)
+    return bool(response and response.get("ok"))
+
+
+def search_via_daemon(request, path=None, use_daemon=True):
+    """Query the daemon, falling back to in-process search when it isn't running or ranks differently"""
+    response = query_daemon({**request, "settings": search_settings()}, path) if use_daemon else None
+    if response is not None and "settings" not in response:
+        return response
+    return handle_request(request)
@@ -0,0 +1,45 @@
+"""Output budget checks for the search CLI"""
+
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import cli
+import core
+
+
+@pytest.mark.parametrize("query, domain, budget", [
+    ("accessibility keyboard", "ux", 4000),
+    ("touch", "ux", 3000),
+    ("accessibility keyboard", "ux", 600),
+])
+@pytest.mark.parametrize("indent", [2, None])
+def test_format_json_within_budget(query, domain, budget, indent):
+    result = core.search(query, domain, 15)
+    output = cli.format_json(result, budget, indent=indent)
+    assert len(output.encode("utf-8")) <= budget
+    parsed = json.loads(output)
+    assert parsed["results"]
+    assert len(parsed["results"]) + parsed.get("omitted", 0) == len(result["results"])
+
+
+def test_read_batch_reports_malformed_objects():
+    lines = io.StringIO('glass cards\n\n{"query": "hero", "domain": "landing"}\n{"query": "hero",\n"quoted"\n')
+    entries = list(cli.read_batch(lines))
+
+    assert entries[:2] == ["glass cards", {"query": "hero", "domain": "landing"}]
+    assert entries[2]["error"].startswith("Invalid JSON on line 4")
+    assert entries[3] == "quoted"
+    assert list(core.search_many(entries[2:3])) == [entries[2]]
+
+
+@pytest.mark.parametrize("fmt", ["markdown", "json", "jsonl"])
+def test_write_output_within_budget(fmt):
+    stream = io.StringIO()
+    cli.write_output(core.search("accessibility keyboard", "ux", 15), fmt, 4000, stream)
+    assert len(stream.getvalue().encode("utf-8")) <= 4000
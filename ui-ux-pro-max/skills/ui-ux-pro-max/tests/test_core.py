@@ -0,0 +1,156 @@
+"""Search engine checks: persisted indexes, result cache keys, domain routing and batches"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+import core
+
+
+def _search(query, *args, **env):
+    """Run the CLI in a fresh process with the given environment; returns the JSON result"""
+    output = subprocess.run(
+        [sys.executable, os.path.join(SCRIPTS_DIR, "search.py"), query, *args, "--format", "json", "--no-daemon"],
+        env={**os.environ, **env},
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output)
+
+
+@pytest.mark.parametrize("setting, values", [
+    ("TOKENIZER_STEPS", ([], ["stem"])),
+    ("RANKING", ("bm25", "bm25f")),
+    ("FUZZY_MATCHING", (False, True)),
+    ("RERANK", (False, True)),
+])
+def test_cache_key_covers_ranking_settings(monkeypatch, setting, values):
+    index = core.load_index(os.path.join(core.DATA_DIR, core.CSV_CONFIG["style"]["file"]),
+                            core.CSV_CONFIG["style"]["search_cols"])
+    keys = []
+    for value in values:
+        monkeypatch.setattr(core, setting, value)
+        keys.append(core._cache_key("search", [index], ["modern", "card"], 3))
+    assert keys[0] != keys[1]
+
+
+def test_shared_cache_dir_is_not_reused_across_tokenizers(tmp_path):
+    query, cache = "modern card layout shadow", {"UI_PRO_MAX_CACHE_DIR": str(tmp_path)}
+    plain = _search(query, "-d", "style", **cache, UI_PRO_MAX_TOKENIZER="")
+    stemmed = _search(query, "-d", "style", **cache, UI_PRO_MAX_TOKENIZER="stem")
+    uncached = _search(query, "-d", "style", UI_PRO_MAX_TOKENIZER="stem")
+
+    assert not stemmed["cache"]["hit"]
+    assert stemmed["results"] == uncached["results"]
+    assert _search(query, "-d", "style", **cache, UI_PRO_MAX_TOKENIZER="")["cache"]["hit"]
+    assert plain["results"] != stemmed["results"]
+
+
+def test_router_falls_back_to_keywords_when_it_cannot_be_saved(monkeypatch):
+    def build():
+        raise AssertionError("router rebuilt")
+
+    monkeypatch.setattr(core, "_ROUTER", None)
+    monkeypatch.setattr(core.DomainRouter, "load", classmethod(lambda cls: None))
+    monkeypatch.setattr(core.DomainRouter, "build", classmethod(lambda cls: build()))
+    monkeypatch.setattr(core.os, "access", lambda path, mode: False)
+
+    assert core.detect_domain("saas dashboard") == "product"
+    assert core.detect_domain("pie chart colors") == "chart"
+    assert list(core.classify_domains("font for a landing page")) == ["landing", "typography"]
+    assert core.search_all("glassmorphism", 2)["count"] == 2
+
+
+def test_search_many_answers_in_order_and_copies_repeats():
+    request = {"query": "minimalism clean", "domain": "style", "max_results": 2}
+    results = list(core.search_many([request, "keyboard navigation", request, {"query": ""}, 42], max_results=1))
+
+    assert [result.get("domain") for result in results[:3]] == ["style", "ux", "style"]
+    assert results[0]["count"] == 2 and len(results[1]["results"]) == 1
+    assert results[2] == results[0] and results[2] is not results[0]
+    results[2]["results"][0]["Style Category"] = "changed"
+    assert results[0]["results"][0]["Style Category"] != "changed"
+    assert results[3] == {"error": "Missing 'query'"}
+    assert "error" in results[4]
+
+
+def _write_csv(path, rows):
+    import csv
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Name", "Keywords", "Notes"])
+        writer.writerows(rows)
+
+
+def _ranking(index, queries):
+    return [[(idx, pytest.approx(score)) for idx, score in index.bm25.score(query, top_k=10)] for query in queries]
+
+
+ITEMS = [
+    ("Glassmorphism", "glass blur frosted", "translucent panels"),
+    ("Dark Mode", "dark mode oled", "low light"),
+    ("Neumorphism", "soft shadow card", "extruded"),
+    ("Minimalism", "minimal clean whitespace", "swiss"),
+]
+QUERIES = ["glass blur", "dark mode", "card shadow", "minimal clean", "neon glow"]
+
+
+def test_persisted_index_loads_with_the_same_rankings(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "_INDEXES", {})
+    path, cols = str(tmp_path / "items.csv"), ["Name", "Keywords"]
+    _write_csv(path, ITEMS)
+    built = core.load_index(path, cols)
+    assert os.path.exists(built.index_path) and os.path.exists(built.columns_path)
+
+    monkeypatch.setattr(core, "_INDEXES", {})
+    monkeypatch.setattr(core.SearchIndex, "build", classmethod(lambda cls, *args: pytest.fail("rebuilt")))
+    loaded = core.load_index(path, cols)
+    assert loaded is not built and loaded.is_current()
+    assert _ranking(loaded, QUERIES) == _ranking(built, QUERIES)
+    assert loaded.rows(range(4)) == built.rows(range(4))
+
+
+def test_incremental_refresh_matches_full_rebuild(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "_INDEXES", {})
+    path, cols = str(tmp_path / "items.csv"), ["Name", "Keywords"]
+    _write_csv(path, ITEMS)
+    core.load_index(path, cols)
+
+    # Edit a row, delete one, append two: patched in place rather than rebuilt
+    _write_csv(path, [
+        ("Glassmorphism", "glass blur frosted acrylic", "translucent panels"),
+        ("Neumorphism", "soft shadow card", "extruded"),
+        ("Minimalism", "minimal clean whitespace", "swiss"),
+        ("Cyberpunk", "neon glow dark", "high contrast"),
+        ("Claymorphism", "clay card soft shadow", "inflated"),
+    ])
+    with monkeypatch.context() as patch:
+        patch.setattr(core.SearchIndex, "build", classmethod(lambda cls, *args: pytest.fail("full rebuild")))
+        refreshed = core.load_index(path, cols)
+
+    rebuilt = core.SearchIndex.build(path, cols)
+    assert refreshed.bm25.N == rebuilt.bm25.N == 5
+    assert refreshed.bm25.avgdl == pytest.approx(rebuilt.bm25.avgdl)
+    assert _ranking(refreshed, QUERIES) == _ranking(rebuilt, QUERIES)
+    assert refreshed.rows(range(5)) == rebuilt.rows(range(5))
+
+    # The refreshed index was persisted, so a new process loads it as current
+    reloaded = core.SearchIndex.load(path, cols)
+    assert reloaded.is_current() and _ranking(reloaded, QUERIES) == _ranking(rebuilt, QUERIES)
+
+
+def test_generate_without_a_product_match(monkeypatch):
+    assert core.generate("zzqx vvbn") == {"domain": core.DESIGN_SYSTEM, "query": "zzqx vvbn", "file": "",
+                                          "count": 0, "results": []}
+
+    # The product matches but its row cannot be read: the other sections still come from the query
+    output_rows = core._output_rows
+    monkeypatch.setattr(core, "_output_rows", lambda index, winners, cols: [] if index.filepath.endswith(
+        core.CSV_CONFIG["product"]["file"]) else output_rows(index, winners, cols))
+    sections = [row["Section"] for row in core.generate("saas dashboard")["results"]]
+    assert "Product" not in sections and {"Style", "Typography"} <= set(sections)
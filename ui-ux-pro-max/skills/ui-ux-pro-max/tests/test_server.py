@@ -0,0 +1,89 @@
+"""Daemon protocol checks: request handling, bad input and settings mismatches"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+import core
+import server
+
+QUERY = {"query": "glassmorphism", "domain": "style", "max_results": 1}
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    """A --serve process on a private socket, started with fuzzy matching on"""
+    path = str(tmp_path / "server.sock")
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(SCRIPTS_DIR, "search.py"), "--serve", "--socket", path],
+        env={**os.environ, "UI_PRO_MAX_FUZZY": "1"}, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while not server.ping(path):
+        assert proc.poll() is None and time.monotonic() < deadline, "daemon did not start"
+        time.sleep(0.05)
+    yield path
+    server.query_daemon({"command": "shutdown"}, path)
+    proc.wait(timeout=10)
+
+
+def _exchange(path, lines):
+    """Send raw request lines over one connection; returns the decoded response lines"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(server.REQUEST_TIMEOUT)
+        sock.connect(path)
+        sock.sendall(b"".join(line + b"\n" for line in lines))
+        with sock.makefile("rb") as reader:
+            return [json.loads(reader.readline()) for _ in lines]
+
+
+def test_bad_lines_are_answered_and_the_connection_stays_open(daemon):
+    query = json.dumps(QUERY).encode("utf-8")
+    invalid_utf8, invalid_json, ok = _exchange(daemon, [b"\xff\xfe{", b'{"query": ', query])
+
+    assert invalid_utf8["error"].startswith("Invalid UTF-8")
+    assert invalid_json["error"].startswith("Invalid JSON")
+    assert ok["results"][0]["Style Category"] == "Glassmorphism"
+
+
+def test_ping_reports_settings_and_mismatched_clients_search_in_process(daemon, monkeypatch):
+    assert server.query_daemon({"command": "ping"}, daemon)["settings"]["UI_PRO_MAX_FUZZY"] == "1"
+
+    monkeypatch.setenv("UI_PRO_MAX_FUZZY", "0")
+    refused = server.query_daemon({**QUERY, "settings": server.search_settings()}, daemon)
+    assert "error" in refused and refused["settings"]["UI_PRO_MAX_FUZZY"] == "1"
+    lookups = core.RESULT_CACHE.hits + core.RESULT_CACHE.misses
+    assert server.search_via_daemon(QUERY, daemon)["results"] == server.handle_request(QUERY)["results"]
+    assert core.RESULT_CACHE.hits + core.RESULT_CACHE.misses == lookups + 2  # both answered in this process
+
+    monkeypatch.setenv("UI_PRO_MAX_FUZZY", "1")
+    assert "error" not in server.query_daemon({**QUERY, "settings": server.search_settings()}, daemon)
+
+
+def test_failing_search_is_an_error_response(monkeypatch):
+    def fail(request):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(core, "_run_request", fail)
+    assert server._answer(QUERY) == {"error": "Internal error: boom"}
+    assert server._answer(["not", "an", "object"]) == {"error": "Request must be a JSON object"}
+
+
+def test_stdio_keeps_answering_after_bad_lines():
+    lines = [b"\xff", b"{bad", json.dumps(QUERY).encode("utf-8"), b'{"command": "nope"}']
+    output = subprocess.run(
+        [sys.executable, os.path.join(SCRIPTS_DIR, "search.py"), "--stdio"],
+        input=b"\n".join(lines) + b"\n", capture_output=True, check=True,
+    ).stdout
+    responses = [json.loads(line) for line in output.splitlines()]
+
+    assert [("error" in response) for response in responses] == [True, True, False, True]
+    assert responses[2]["results"][0]["Style Category"] == "Glassmorphism"